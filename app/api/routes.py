@@ -1,37 +1,198 @@
 # app/api/routes.py
 
+import asyncio
+import copy
+import json
 import os
+import secrets
+import threading
+import time
 import xml.etree.ElementTree as ET
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from tempfile import NamedTemporaryFile
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, PlainTextResponse, Response
+from pydantic import BaseModel, ValidationError
 
 from app.core.config import settings
+from app.core.metrics import stage, track_executor_queue
+from app.core.profiler import ProfilerBusyError, profiler
 from app.models.userContext import UserContext
 from app.repositories.graph_repository import GraphRepository
+from app.repositories.popularity_repository import PopularityRepository
+from app.services.autocomplete import AutocompleteIndex, build_autocomplete_index
+from app.services.floor_geometry import (
+    EncodedGeometry,
+    build_floor_geometry,
+    encode_geometry,
+    etag_matches,
+)
+from app.services.live_route import LiveRoute
 from app.services.object_processor import get_objects_map
+from app.services.plan_reloader import PlanReloader
+from app.services.plan_snapshot import PlanSnapshot, build_plan_snapshot, reload_plan_snapshot
 from app.services.route_service import RouteService
-from app.services.search_engine import load_data, search_entities
+from app.services.search_engine import load_data, search_entities, search_entities_batch
+from app.services.segment_index import SegmentIndex, build_segment_index
 from app.services.svg_processor import (
     add_room_labels,
     process_floor_svg,
     process_route_svg,
 )
+from app.utils.query_log import QueryLog, read_query_log
+from app.utils.ranker import PopularityRanker
 
 router = APIRouter()
 
-data = load_data("data/plan_combined.json")
+# Текущий снимок плана: заменяется целиком одним присваиванием при перезагрузке
+plan: Optional[PlanSnapshot] = None
+plan_lock = threading.Lock()
+
+# Пул для тяжёлой обработки, чтобы она не блокировала event loop
+search_executor = ThreadPoolExecutor(max_workers=settings.search_workers)
+track_executor_queue("search", search_executor)
 
 
+def get_plan() -> PlanSnapshot:
+    """
+    Текущий снимок плана (объекты, пространственный индекс, таблица актуальности).
+    Обработчик берёт ссылку один раз и работает только с ней, даже если план перезагрузится.
+    """
+    global plan
+    current = plan
+    if current is None:
+        with plan_lock:
+            if plan is None:
+                with stage("startup", "data_load"):
+                    plan = build_plan_snapshot(load_data(settings.data_file_path))
+            current = plan
+    return current
+
+
+@lru_cache(maxsize=1)
 def get_repository() -> GraphRepository:
-    return GraphRepository(data_file_path=settings.data_file_path)
+    with stage("startup", "graph_load"):
+        return GraphRepository(data_file_path=settings.data_file_path)
+
+
+@lru_cache(maxsize=1)
+def get_popularity_ranker() -> PopularityRanker:
+    ranker = PopularityRanker(
+        [obj["id"] for obj in get_plan().data],
+        PopularityRepository(settings.popularity_database_url),
+        half_life_hours=settings.popularity_half_life_hours,
+        flush_interval=settings.popularity_flush_interval,
+    )
+    return ranker.start()
+
+
+@lru_cache(maxsize=1)
+def get_query_log() -> QueryLog:
+    if not settings.query_log_enabled:
+        return QueryLog(None)
+    query_log = QueryLog(
+        settings.query_log_path,
+        capacity=settings.query_log_capacity,
+        flush_interval=settings.query_log_flush_interval,
+        max_bytes=settings.query_log_max_bytes,
+        backups=settings.query_log_backups,
+    )
+    return query_log.start()
+
+
+@lru_cache(maxsize=1)
+def get_svg_template() -> ET.ElementTree:
+    """Разобранный SVG плана. Не изменяется: обработчики работают со своей копией."""
+    return ET.parse(settings.svg_file_path)
+
+
+def copy_svg_template() -> ET.ElementTree:
+    return ET.ElementTree(copy.deepcopy(get_svg_template().getroot()))
 
 
+@lru_cache(maxsize=1)
+def get_segment_index() -> SegmentIndex:
+    """Индекс разрешённых линий: координаты из SVG, концы линий — из рёбер графа плана."""
+    return build_segment_index(get_svg_template().getroot(), get_repository().data.graph.edges, settings.floors)
+
+
+@lru_cache(maxsize=None)
+def get_floor_geometry(floor: str) -> EncodedGeometry:
+    """Геометрия этажа кодируется и сжимается один раз на снимок плана."""
+    root = get_svg_template().getroot()
+    objects_map = get_objects_map(get_svg_template(), settings.floors)
+    return encode_geometry(build_floor_geometry(root, floor, objects_map, settings.floor_geometry_scale))
+
+
+@lru_cache(maxsize=1)
+def get_autocomplete_index() -> AutocompleteIndex:
+    """Индекс подсказок строится один раз на снимок данных."""
+    with open(settings.synonyms_file_path, "r", encoding="utf-8") as f:
+        synonyms = json.load(f)
+    objects_map = get_objects_map(get_svg_template(), settings.floors)
+    popularity = get_popularity_ranker().as_dict()
+    return build_autocomplete_index(
+        objects_map, get_plan().data, synonyms, popularity, top_k=settings.autocomplete_top_k
+    )
+
+
+@lru_cache(maxsize=1)
 def get_route_service(repository: GraphRepository = Depends(get_repository)) -> RouteService:
-    return RouteService(repository)
+    service = RouteService(
+        repository,
+        contract=settings.route_graph_contraction,
+        tree_cache_bytes=settings.route_tree_cache_max_bytes,
+    )
+    if settings.route_tree_cache_warmup > 0:
+        destinations = top_route_destinations(settings.route_tree_cache_warmup)
+        print(f"Прогрето деревьев маршрутов: {service.warm_route_trees(destinations)}")
+    return service
+
+
+def top_route_destinations(limit: int) -> List[str]:
+    """Самые частые кабинеты назначения маршрутов по логу запросов."""
+    if not settings.query_log_path:
+        return []
+    counts = Counter(record.get("office_b_id") for record in read_query_log(settings.query_log_path, kinds=["route"]))
+    counts.pop(None, None)
+    return [office_id for office_id, _ in counts.most_common(limit)]
+
+
+def reload_floors(changed_floors: List[str]):
+    """
+    Подхватывает регенерированный план. Новый снимок плана строится целиком и публикуется
+    одним присваиванием; пространственный индекс перестраивается только для изменённых этажей.
+    Граф перестраивается целиком, так как лестницы связывают этажи.
+    Популярность пересчитывается по новому списку объектов.
+    """
+    global plan
+    with stage("startup", "data_load"):
+        new_data = load_data(settings.data_file_path)
+    with plan_lock:
+        if plan is not None:
+            plan = reload_plan_snapshot(plan, new_data, changed_floors)
+    if get_popularity_ranker.cache_info().currsize:
+        get_popularity_ranker().set_objects([obj["id"] for obj in new_data])
+
+    get_autocomplete_index.cache_clear()
+    get_svg_template.cache_clear()
+    get_segment_index.cache_clear()
+    get_floor_geometry.cache_clear()
+    get_repository.cache_clear()
+    get_route_service.cache_clear()
+    get_route_service(repository=get_repository())
+    print(f"План перезагружен, изменённые этажи: {', '.join(changed_floors)}")
+
+
+@lru_cache(maxsize=1)
+def get_plan_reloader() -> Optional[PlanReloader]:
+    if settings.plan_reload_interval <= 0:
+        return None
+    return PlanReloader(settings.plan_manifest_path, settings.plan_reload_interval, reload_floors).start()
 
 
 # Pydantic модели для ответов
@@ -41,23 +202,164 @@ class RouteResponse(BaseModel):
     total_weight: float
 
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    user_context: Optional[UserContext] = None
+
+
+class LivePosition(BaseModel):
+    floor: str
+    x: float
+    y: float
+
+
 @router.post("/search", summary="Поиск объектов", description="Позволяет искать объекты по запросу пользователя.")
 async def search(
     query: str = Query(..., description="Запрос пользователя"),
     user_floor: str = Query(None, description="Этаж пользователя"),
+    user_office_id: Optional[str] = Query(None, description="ID кабинета, в котором находится пользователь"),
+    radius: Optional[float] = Query(None, gt=0, description="Радиус поиска вокруг пользователя"),
     user_context: Optional[UserContext] = None,
+    snapshot: PlanSnapshot = Depends(get_plan),
+    popularity_ranker: PopularityRanker = Depends(get_popularity_ranker),
+    route_service: RouteService = Depends(get_route_service),
+    query_log: QueryLog = Depends(get_query_log),
 ):
     """
-    Выполняет поиск объектов в системе.
+    Выполняет поиск объектов на всех этажах с ранжированием по пешему расстоянию.
 
     - **query**: Запрос пользователя.
     - **user_floor**: Этаж, на котором находится пользователь.
+    - **user_office_id**: Кабинет пользователя, от которого считается пешее расстояние.
+    - **radius**: Искать только объекты в этом радиусе от пользователя.
     - **user_preferences**: Избранные объекты пользователя.
     """
-    results = search_entities(query, user_floor, user_context, data)
+    started = time.perf_counter()
+    results = search_entities(
+        query,
+        user_floor,
+        user_context,
+        snapshot.data,
+        snapshot.spatial_index,
+        radius,
+        popularity_ranker,
+        route_service,
+        user_office_id,
+        snapshot.time_table,
+    )
+    query_log.log(
+        "search",
+        query=query,
+        user_floor=user_floor,
+        user_office_id=user_office_id,
+        results=len(results),
+        latency_ms=round((time.perf_counter() - started) * 1000, 3),
+    )
     return {"query": query, "results": results, "user_context": user_context}
 
 
+@router.post(
+    "/search/batch", summary="Пакетный поиск", description="Поиск сразу по нескольким запросам с общей обработкой."
+)
+async def search_batch(
+    request: BatchSearchRequest,
+    user_floor: str = Query(None, description="Этаж пользователя"),
+    user_office_id: Optional[str] = Query(None, description="ID кабинета, в котором находится пользователь"),
+    snapshot: PlanSnapshot = Depends(get_plan),
+    popularity_ranker: PopularityRanker = Depends(get_popularity_ranker),
+    route_service: RouteService = Depends(get_route_service),
+    query_log: QueryLog = Depends(get_query_log),
+):
+    """
+    Выполняет поиск по списку запросов и возвращает результаты в том же порядке.
+
+    - **queries**: Запросы пользователя (не больше batch_search_max_queries).
+    - **user_floor**: Этаж, на котором находится пользователь.
+    - **user_office_id**: Кабинет пользователя, от которого считается пешее расстояние.
+    """
+    if len(request.queries) > settings.batch_search_max_queries:
+        raise HTTPException(
+            status_code=400, detail=f"Too many queries. Maximum is {settings.batch_search_max_queries}"
+        )
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(
+        search_executor,
+        partial(
+            search_entities_batch,
+            request.queries,
+            user_floor,
+            request.user_context,
+            snapshot.data,
+            snapshot.spatial_index,
+            popularity_ranker,
+            route_service,
+            user_office_id,
+            snapshot.time_table,
+            settings.search_workers,
+        ),
+    )
+    latency_ms = round((time.perf_counter() - started) * 1000, 3)
+    for query, r in zip(request.queries, results):
+        query_log.log(
+            "search_batch",
+            query=query,
+            user_floor=user_floor,
+            user_office_id=user_office_id,
+            results=len(r),
+            batch_size=len(request.queries),
+            latency_ms=latency_ms,
+        )
+    return {"results": [{"query": query, "results": r} for query, r in zip(request.queries, results)]}
+
+
+@router.post("/feedback", summary="Обратная связь", description="Учитывает просмотр или клик по объекту.")
+async def feedback(
+    object_id: str = Query(..., description="ID объекта"),
+    event: Literal["view", "click"] = Query(..., description="Тип события"),
+    popularity_ranker: PopularityRanker = Depends(get_popularity_ranker),
+):
+    """
+    Учитывает просмотр или клик по объекту в популярности.
+    События сохраняются пачками в фоне.
+    """
+    if object_id not in popularity_ranker.index:
+        raise HTTPException(status_code=404, detail=f"Object '{object_id}' not found")
+    popularity_ranker.update_stats(object_id, viewed=event == "view", clicked=event == "click")
+    return {"status": "accepted"}
+
+
+@router.get("/objects/near", summary="Объекты рядом", description="Объекты этажа в радиусе от точки.")
+async def get_objects_near(
+    floor: str = Query(..., description="Этаж"),
+    x: float = Query(..., description="Координата X"),
+    y: float = Query(..., description="Координата Y"),
+    radius: float = Query(100.0, gt=0, description="Радиус поиска"),
+    limit: int = Query(10, ge=1, description="Максимальное количество объектов"),
+    snapshot: PlanSnapshot = Depends(get_plan),
+):
+    """
+    Возвращает объекты этажа, ближайшие к точке, отсортированные по расстоянию.
+    """
+    return {"results": snapshot.spatial_index.nearby(floor, x, y, radius, limit)}
+
+
+@router.get("/autocomplete", summary="Подсказки при наборе", description="Быстрые подсказки объектов по префиксу.")
+async def autocomplete(
+    prefix: str = Query(..., description="Введённый пользователем префикс"),
+    limit: int = Query(10, ge=1, description="Максимальное количество подсказок"),
+    index: AutocompleteIndex = Depends(get_autocomplete_index),
+):
+    """
+    Возвращает подсказки по префиксу без полной обработки запроса.
+
+    - **prefix**: Введённый текст.
+    - **limit**: Максимальное количество подсказок.
+    """
+    return {"prefix": prefix, "results": index.lookup(prefix, limit)}
+
+
 @router.get("/floor-plan", response_class=FileResponse)
 async def get_floor_plan(
     floor: str = Query(..., description="Этаж для отображения"),
@@ -65,12 +367,12 @@ async def get_floor_plan(
     office_b_id: str | None = Query(None, description="ID кабинета B"),
     top_k: int = Query(1, ge=1, description="Количество топ маршрутов"),
     service: RouteService = Depends(get_route_service),
+    query_log: QueryLog = Depends(get_query_log),
 ):
     """
     Возвращает SVG файл с планом этажа. Если указаны office_a_id и office_b_id,
     то также отображает маршрут между ними.
     """
-    file_path = "media/улк-5.svg"
     all_floors = ['Floor_First', 'Floor_Second', 'Floor_Third', 'Floor_Fourth']
 
     # Проверяем валидность запрошенного этажа
@@ -78,12 +380,29 @@ async def get_floor_plan(
         raise HTTPException(status_code=400, detail=f"Invalid floor. Must be one of: {', '.join(all_floors)}")
 
     try:
-        tree = ET.parse(file_path)
+        with stage("floor_plan", "svg_parse"):
+            tree = copy_svg_template()
 
         # Process the SVG based on whether we're showing a route or just a floor
         if office_a_id and office_b_id:
             try:
-                routes = service.find_top_k_paths(office_a_id, office_b_id, top_k)
+                started = time.perf_counter()
+                with stage("floor_plan", "route_search"):
+                    # Один маршрут берётся из кэша деревьев путей, несколько — алгоритмом Йена
+                    if top_k == 1:
+                        routes, cache_hit = service.find_shortest_path(office_a_id, office_b_id)
+                    else:
+                        routes, cache_hit = service.find_top_k_paths(office_a_id, office_b_id, top_k), False
+                query_log.log(
+                    "route",
+                    office_a_id=office_a_id,
+                    office_b_id=office_b_id,
+                    top_k=top_k,
+                    floor=floor,
+                    routes=len(routes),
+                    cache_hit=cache_hit,
+                    latency_ms=round((time.perf_counter() - started) * 1000, 3),
+                )
                 if not routes:
                     raise HTTPException(status_code=404, detail="No routes found")
 
@@ -95,23 +414,28 @@ async def get_floor_plan(
                     route_lines[line_floor].append(line_id)
 
                 # Add labels before processing the route
-                add_room_labels(tree)
+                with stage("floor_plan", "label_injection"):
+                    add_room_labels(tree)
 
-                if floor not in route_lines:
-                    processed_tree = process_floor_svg(tree, floor, all_floors)
-                else:
-                    processed_tree = process_route_svg(tree, route_lines, all_floors, floor)
+                with stage("floor_plan", "restyle"):
+                    if floor not in route_lines:
+                        processed_tree = process_floor_svg(tree, floor, all_floors)
+                    else:
+                        processed_tree = process_route_svg(tree, route_lines, all_floors, floor)
 
             except ValueError as e:
                 raise HTTPException(status_code=400, detail=str(e))
         else:
             # Add labels before processing the floor
-            add_room_labels(tree)
-            processed_tree = process_floor_svg(tree, floor, all_floors)
+            with stage("floor_plan", "label_injection"):
+                add_room_labels(tree)
+            with stage("floor_plan", "restyle"):
+                processed_tree = process_floor_svg(tree, floor, all_floors)
 
         # Создаем временный файл
         with NamedTemporaryFile(delete=False, suffix='.svg') as tmp_file:
-            processed_tree.write(tmp_file.name, encoding='utf-8', xml_declaration=True)
+            with stage("floor_plan", "serialization"):
+                processed_tree.write(tmp_file.name, encoding='utf-8', xml_declaration=True)
 
             async def cleanup_file():
                 try:
@@ -123,25 +447,198 @@ async def get_floor_plan(
                 tmp_file.name, media_type="image/svg+xml", filename=f"floor_{floor}.svg", background=cleanup_file
             )
 
+    except HTTPException:
+        raise
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="SVG file not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 
+@router.get("/route", response_model=List[RouteResponse], summary="Маршрут между кабинетами")
+async def get_route(
+    office_a_id: str = Query(..., description="ID кабинета A"),
+    office_b_id: str = Query(..., description="ID кабинета B"),
+    top_k: int = Query(1, ge=1, description="Количество топ маршрутов"),
+    service: RouteService = Depends(get_route_service),
+    query_log: QueryLog = Depends(get_query_log),
+):
+    """
+    Возвращает маршруты без отрисовки SVG — для клиентов, которые рисуют план сами
+    по /floor-geometry и подсвечивают линии маршрута по line_ids.
+    """
+    started = time.perf_counter()
+    try:
+        with stage("route", "route_search"):
+            if top_k == 1:
+                routes, cache_hit = service.find_shortest_path(office_a_id, office_b_id)
+            else:
+                routes, cache_hit = service.find_top_k_paths(office_a_id, office_b_id, top_k), False
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    query_log.log(
+        "route",
+        office_a_id=office_a_id,
+        office_b_id=office_b_id,
+        top_k=top_k,
+        floor=None,
+        routes=len(routes),
+        cache_hit=cache_hit,
+        latency_ms=round((time.perf_counter() - started) * 1000, 3),
+    )
+    if not routes:
+        raise HTTPException(status_code=404, detail="No routes found")
+    return routes
+
+
+@router.get(
+    "/floor-geometry", summary="Геометрия этажа", description="Векторная геометрия этажа для отрисовки на клиенте."
+)
+async def get_floor_geometry_route(
+    floor: str = Query(..., description="Этаж"),
+    if_none_match: str | None = Header(None),
+    accept_encoding: str | None = Header(None),
+):
+    """
+    Возвращает кабинеты, лестницы, двери, разрешённые линии (по line_id) и якоря подписей этажа
+    в компактном JSON с целыми координатами (см. build_floor_geometry).
+
+    Ответ готовится один раз на снимок плана и отдаётся с ETag: повторный запрос с If-None-Match
+    получает 304 без тела. Клиентам, принимающим gzip, отдаётся заранее сжатая версия.
+    """
+    if floor not in settings.floors:
+        raise HTTPException(status_code=400, detail=f"Invalid floor. Must be one of: {', '.join(settings.floors)}")
+
+    try:
+        with stage("floor_geometry", "encode"):
+            geometry = get_floor_geometry(floor)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="SVG file not found")
+
+    headers = {"ETag": geometry.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if if_none_match and etag_matches(if_none_match, geometry.etag):
+        return Response(status_code=304, headers=headers)
+    if accept_encoding and "gzip" in accept_encoding.lower():
+        headers["Content-Encoding"] = "gzip"
+        return Response(geometry.gzip_body, media_type="application/json", headers=headers)
+    return Response(geometry.body, media_type="application/json", headers=headers)
+
+
+@router.get(
+    "/route/from-point", summary="Маршрут от точки", description="Маршрут от координат пользователя до кабинета."
+)
+async def get_route_from_point(
+    floor: str = Query(..., description="Этаж пользователя"),
+    x: float = Query(..., description="Координата X"),
+    y: float = Query(..., description="Координата Y"),
+    office_b_id: str = Query(..., description="ID кабинета назначения"),
+    service: RouteService = Depends(get_route_service),
+    segment_index: SegmentIndex = Depends(get_segment_index),
+    query_log: QueryLog = Depends(get_query_log),
+):
+    """
+    Привязывает точку к ближайшей разрешённой линии этажа и строит от неё кратчайший маршрут
+    по дереву путей к кабинету из кэша.
+    """
+    started = time.perf_counter()
+    try:
+        live_route = LiveRoute(service, segment_index, office_b_id)
+        result = live_route.update(floor, x, y)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    query_log.log(
+        "route_from_point",
+        office_b_id=office_b_id,
+        floor=floor,
+        cache_hit=live_route.cache_hit,
+        latency_ms=round((time.perf_counter() - started) * 1000, 3),
+    )
+    return {"route": result["route"], "snap": result["snap"]}
+
+
+@router.websocket("/route/live")
+async def route_live(
+    websocket: WebSocket,
+    office_b_id: str = Query(..., description="ID кабинета назначения"),
+    service: RouteService = Depends(get_route_service),
+    segment_index: SegmentIndex = Depends(get_segment_index),
+    query_log: QueryLog = Depends(get_query_log),
+):
+    """
+    Поток маршрутов от движущегося пользователя: клиент присылает {"floor", "x", "y"} при каждом
+    смещении, сервер отвечает маршрутом. Дерево путей к кабинету берётся один раз на соединение,
+    а продолжения от уже встреченных линий переиспользуются.
+    """
+    await websocket.accept()
+    try:
+        live_route = LiveRoute(service, segment_index, office_b_id)
+    except ValueError as e:
+        await websocket.send_json({"error": str(e)})
+        await websocket.close(code=1008)
+        return
+
+    updates, elapsed = 0, 0.0
+    try:
+        while True:
+            message = await websocket.receive_json()
+            started = time.perf_counter()
+            try:
+                position = LivePosition.model_validate(message)
+                result = live_route.update(position.floor, position.x, position.y)
+            except (ValidationError, ValueError) as e:
+                await websocket.send_json({"error": str(e)})
+                continue
+            elapsed += time.perf_counter() - started
+            updates += 1
+            await websocket.send_json(result)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        query_log.log(
+            "live_route",
+            office_b_id=office_b_id,
+            updates=updates,
+            cache_hit=live_route.cache_hit,
+            latency_ms=round(elapsed * 1000, 3),
+        )
+
+
 @router.get("/objects", response_model=Dict[str, str])
 async def get_objects():
     """
     Возвращает мапу соответствия ID объектов и их человекочитаемых назв��ний.
     """
-    file_path = "media/улк-5.svg"
     all_floors = ['Floor_First', 'Floor_Second', 'Floor_Third', 'Floor_Fourth']
 
     try:
-        tree = ET.parse(file_path)
+        with stage("objects", "svg_parse"):
+            tree = get_svg_template()
         return get_objects_map(tree, all_floors)
 
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="SVG file not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/debug/profile", response_class=PlainTextResponse, include_in_schema=False)
+async def profile(
+    seconds: float = Query(10.0, gt=0, description="Длительность профилирования"),
+    interval: float = Query(0.005, ge=0.001, le=1.0, description="Интервал между снимками стеков"),
+    x_admin_token: str | None = Header(None),
+):
+    """
+    Профилирует процесс воркера в течение seconds секунд и возвращает свёрнутые стеки.
+    Выключено, пока не задан PROFILER_ADMIN_TOKEN; одновременно допускается одна сессия.
+    """
+    if settings.profiler_admin_token is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.profiler_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must not exceed {settings.profiler_max_seconds}")
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, profiler.run, seconds, interval)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
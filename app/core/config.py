@@ -3,6 +3,35 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     data_file_path: str = "data/plan_combined.json"
+    svg_file_path: str = "media/улк-5.svg"
+    synonyms_file_path: str = "data/synonyms.json"
+    floors: list[str] = ['Floor_First', 'Floor_Second', 'Floor_Third', 'Floor_Fourth']
+    autocomplete_top_k: int = 10
+    search_walking_distance_cutoff: float | None = None
+    route_graph_contraction: bool = True
+    route_tree_cache_max_bytes: int = 32 * 2**20
+    route_tree_cache_warmup: int = 0
+    floor_geometry_scale: int = 10
+    batch_search_max_queries: int = 100
+    search_workers: int = 4
+    stage_metrics_enabled: bool = True
+    profiler_admin_token: str | None = None
+    profiler_max_seconds: float = 60.0
+    query_log_enabled: bool = True
+    query_log_path: str = "data/logs/queries.jsonl"
+    query_log_capacity: int = 10000
+    query_log_flush_interval: float = 1.0
+    query_log_max_bytes: int = 50 * 2**20
+    query_log_backups: int = 5
+    plan_manifest_path: str = "data/plan_manifest.json"
+    plan_reload_interval: float = 5.0
+    popularity_database_url: str = "sqlite:///data/popularity.sqlite3"
+    popularity_half_life_hours: float = 168.0
+    popularity_flush_interval: float = 5.0
+    symspell_domain_dictionary_path: str = "data/domain_dictionary.txt"
+    symspell_general_fallback: bool = False
+    symspell_dictionary_path: str = "frequency_dictionary_ru.txt"
+    symspell_pickle_path: str = "data/symspell_ru.pickle"
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,54 @@
+import time
+from contextlib import nullcontext
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.config import settings
+
+# Метки ограничены фиксированными наборами pipeline/stage, чтобы число временных рядов не росло
+STAGE_LATENCY = Histogram(
+    "pipeline_stage_duration_seconds",
+    "Время выполнения этапов обработки запросов",
+    ["pipeline", "stage"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Обращения к кэшам", ["cache", "result"])
+EXECUTOR_QUEUE_DEPTH = Gauge("executor_queue_depth", "Задачи, ожидающие свободного потока", ["executor"])
+QUERY_LOG_DROPPED = Counter("query_log_dropped_total", "Записи лога запросов, отброшенные при переполнении буфера")
+
+_NOOP = nullcontext()
+
+
+class StageTimer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+def stage(pipeline: str, name: str):
+    """
+    Замеряет этап: `with stage("search", "translit"): ...`.
+    При выключенных метриках возвращает общий пустой контекст без замеров.
+    """
+    if not settings.stage_metrics_enabled:
+        return _NOOP
+    return StageTimer(STAGE_LATENCY.labels(pipeline, name))
+
+
+def record_cache(cache: str, hit: bool):
+    if settings.stage_metrics_enabled:
+        CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def track_executor_queue(name: str, executor):
+    """Глубина очереди считается при чтении /metrics, на пути запроса затрат нет."""
+    EXECUTOR_QUEUE_DEPTH.labels(name).set_function(lambda: executor._work_queue.qsize())
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -22,11 +22,17 @@ class Door(BaseModel):
     parsed_id: ParsedID
 
 
+class WorkingHours(BaseModel):
+    open: str  # "HH:MM"
+    close: str  # "HH:MM"
+
+
 class Object(BaseModel):
     id: str
     parsed_id: ParsedID
     position: Position
     doors: List[Door]
+    working_hours: Optional[WorkingHours] = None
 
 
 class GraphData(BaseModel):
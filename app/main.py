@@ -43,6 +43,16 @@ def update_system_metrics():
         time.sleep(1)
 
 
-threading.Thread(target=update_system_metrics, daemon=True).start()
+@app.on_event("startup")
+def start_system_metrics():
+    # Поток запускается в каждом воркере: при pre-fork потоки мастера не наследуются
+    threading.Thread(target=update_system_metrics, daemon=True).start()
+
+
+@app.on_event("startup")
+def start_plan_reloader():
+    # Проверка манифеста регенерации плана, в каждом воркере
+    routes.get_plan_reloader()
+
 
 instrumentator.expose(app, endpoint="/metrics")
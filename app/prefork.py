@@ -0,0 +1,130 @@
+"""
+Запуск нескольких воркеров с общими данными только для чтения.
+
+Мастер один раз загружает план, граф, индексы, шаблон SVG и словари, замораживает их
+через gc.freeze() и делает fork. Воркеры делят эти страницы памяти copy-on-write,
+поэтому память почти не растёт с числом воркеров.
+
+Пример: python -m app.prefork --workers 4 --port 8000
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import psutil
+import uvicorn
+
+from app.core.config import settings
+
+
+def format_memory(process: psutil.Process) -> str:
+    memory = process.memory_full_info()
+    return f"RSS {memory.rss / 2**20:.1f} МБ, PSS {memory.pss / 2**20:.1f} МБ, USS {memory.uss / 2**20:.1f} МБ"
+
+
+def preload():
+    """Строит все неизменяемые структуры в мастере до fork."""
+    from app.api import routes
+    from app.main import app
+    from app.utils.text_processing import load_synonym_phrases, load_synonyms, warmup
+
+    routes.get_route_service(repository=routes.get_repository())
+    routes.get_plan()
+    routes.get_svg_template()
+    routes.get_segment_index()
+    for floor in settings.floors:
+        routes.get_floor_geometry(floor)
+    warmup()
+    load_synonyms(settings.synonyms_file_path)
+    load_synonym_phrases(settings.synonyms_file_path)
+
+    # Объекты мастера больше не обходятся сборщиком мусора, и их страницы не копируются при записи счётчиков
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def serve(sock: socket.socket, app, log_level: str):
+    if app is None:
+        from app.main import app
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def report_memory(workers: list[int]):
+    for pid in workers:
+        try:
+            print(f"Воркер {pid}: {format_memory(psutil.Process(pid))}")
+        except psutil.Error as e:
+            print(f"Воркер {pid}: память недоступна ({e})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запуск API в нескольких воркерах с общими предзагруженными данными.")
+    parser.add_argument('--host', type=str, default="0.0.0.0", help="Адрес (по умолчанию: 0.0.0.0)")
+    parser.add_argument('--port', type=int, default=8000, help="Порт (по умолчанию: 8000)")
+    parser.add_argument('-w', '--workers', type=int, default=2, help="Количество воркеров (по умолчанию: 2)")
+    parser.add_argument('--no-preload', action='store_true', help="Загружать данные в каждом воркере отдельно")
+    parser.add_argument(
+        '--report-after', type=float, default=5.0, help="Через сколько секунд вывести память воркеров (по умолчанию: 5)"
+    )
+    parser.add_argument('--log-level', type=str, default="info", help="Уровень логов uvicorn")
+    args = parser.parse_args()
+
+    master = psutil.Process()
+    print(f"Мастер до загрузки: {format_memory(master)}")
+    app = None
+    if not args.no_preload:
+        started = time.perf_counter()
+        app = preload()
+        print(f"Данные загружены за {time.perf_counter() - started:.2f} с. Мастер: {format_memory(master)}")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    workers = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                serve(sock, app, args.log_level)
+            finally:
+                os._exit(0)
+        workers.append(pid)
+
+    def stop(signum, frame):
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    if args.report_after > 0:
+        time.sleep(args.report_after)
+        report_memory(workers)
+
+    exit_code = 0
+    for pid in workers:
+        _, status = os.waitpid(pid, 0)
+        code = os.waitstatus_to_exitcode(status)
+        # uvicorn после штатной остановки повторно поднимает полученный сигнал
+        if code not in (0, -signal.SIGTERM, -signal.SIGINT):
+            exit_code = exit_code or code
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# app/repositories/popularity_repository.py
+
+import math
+import os
+from typing import Dict, Tuple
+
+from sqlalchemy import Column, Float, MetaData, String, Table, create_engine, event, func, select
+from sqlalchemy.dialects.sqlite import insert
+
+metadata = MetaData()
+
+# Счётчики хранятся затухшими до момента last_updated. При каждом обновлении строка сначала
+# доводится до текущего момента, поэтому показатели экспонент ограничены временем между событиями.
+popularity_table = Table(
+    "popularity",
+    metadata,
+    Column("object_id", String, primary_key=True),
+    Column("views", Float, nullable=False, default=0.0),
+    Column("clicks", Float, nullable=False, default=0.0),
+    Column("last_updated", Float, nullable=False),
+)
+
+
+def _register_exp(dbapi_connection, connection_record):
+    # exp есть в SQLite, только если он собран с математическими функциями
+    dbapi_connection.create_function("exp", 1, math.exp, deterministic=True)
+
+
+class PopularityRepository:
+    def __init__(self, database_url: str):
+        if database_url.startswith("sqlite:///"):
+            directory = os.path.dirname(database_url[len("sqlite:///"):])
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.engine = create_engine(database_url, connect_args={"timeout": 30})
+        event.listen(self.engine, "connect", _register_exp)
+        metadata.create_all(self.engine)
+
+    def add_counts(self, increments: Dict[str, Tuple[float, float]], now: float, decay_rate: float):
+        """
+        Атомарно прибавляет пачку приращений {object_id: (views, clicks)}, приведённых к моменту now.
+        Сохранённые счётчики затухают от last_updated до now в том же UPDATE, поэтому воркеры
+        не теряют обновления друг друга.
+        """
+        if not increments:
+            return
+        rows = [
+            {"object_id": k, "views": views, "clicks": clicks, "last_updated": now}
+            for k, (views, clicks) in increments.items()
+        ]
+        statement = insert(popularity_table)
+        # Часы воркеров могут немного расходиться: более поздний last_updated не откатывается
+        elapsed = func.max(statement.excluded.last_updated - popularity_table.c.last_updated, 0.0)
+        decay = func.exp(-decay_rate * elapsed)
+        statement = statement.on_conflict_do_update(
+            index_elements=[popularity_table.c.object_id],
+            set_={
+                "views": popularity_table.c.views * decay + statement.excluded.views,
+                "clicks": popularity_table.c.clicks * decay + statement.excluded.clicks,
+                "last_updated": func.max(popularity_table.c.last_updated, statement.excluded.last_updated),
+            },
+        )
+        with self.engine.begin() as connection:
+            connection.execute(statement, rows)
+
+    def get_all_counts(self) -> Dict[str, Tuple[float, float, float]]:
+        """Счётчики {object_id: (views, clicks, last_updated)}."""
+        with self.engine.connect() as connection:
+            rows = connection.execute(select(popularity_table))
+            return {row.object_id: (row.views, row.clicks, row.last_updated) for row in rows}
@@ -0,0 +1,127 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.utils.text_processing import layout_variants
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_prefix(text: str) -> str:
+    """Приводит ввод к виду ключей индекса: нижний регистр и одинарные пробелы."""
+    return WHITESPACE_PATTERN.sub(' ', text.lower()).lstrip()
+
+
+class TrieNode:
+    __slots__ = ('children', 'entries', 'top')
+
+    def __init__(self):
+        self.children: Dict[str, 'TrieNode'] = {}
+        self.entries: Dict[str, int] = {}  # ID объекта -> уровень совпадения для ключей, оканчивающихся здесь
+        self.top: Tuple[Tuple[int, str], ...] = ()  # Предвычисленный топ-k (уровень, ID) для этого префикса
+
+
+class AutocompleteIndex:
+    """
+    Префиксное дерево для подсказок при наборе. Топ-k объектов хранится в каждом узле,
+    поэтому поиск по префиксу стоит O(длина префикса) и не выполняет NLP-обработку.
+    """
+
+    def __init__(self, names: Dict[str, str], popularity: Optional[Dict[str, float]] = None, top_k: int = 10):
+        self.names = names
+        self.popularity = popularity or {}
+        self.top_k = top_k
+        self.root = TrieNode()
+
+    def add(self, key: str, object_id: str, tier: int = 0):
+        """
+        Добавляет ключ и все его суффиксы, начинающиеся с нового слова.
+        Меньший tier ранжируется выше: собственные названия объекта важнее синонимов.
+        """
+        key = normalize_prefix(key).strip()
+        words = key.split(' ')
+        for i in range(len(words)):
+            node = self.root
+            for char in ' '.join(words[i:]):
+                node = node.children.setdefault(char, TrieNode())
+            node.entries[object_id] = min(tier, node.entries.get(object_id, tier))
+
+    def rank_key(self, candidate: Tuple[int, str]):
+        tier, object_id = candidate
+        return (tier, -self.popularity.get(object_id, 0.0), self.names.get(object_id, object_id))
+
+    def build(self):
+        """Вычисляет топ-k в каждом узле обходом дерева снизу вверх."""
+        stack = [(self.root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if not children_done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children.values())
+                continue
+            candidates = dict(node.entries)
+            for child in node.children.values():
+                for tier, object_id in child.top:
+                    candidates[object_id] = min(tier, candidates.get(object_id, tier))
+            ranked = sorted(((tier, object_id) for object_id, tier in candidates.items()), key=self.rank_key)
+            node.top = tuple(ranked[: self.top_k])
+        return self
+
+    def find_node(self, prefix: str) -> Optional[TrieNode]:
+        node = self.root
+        for char in normalize_prefix(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def lookup(self, prefix: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        """Ищет префикс, а если он не найден — его вариант в другой раскладке клавиатуры."""
+        node = None
+        for variant in layout_variants(prefix):
+            node = self.find_node(variant)
+            if node is not None:
+                break
+        if node is None:
+            return []
+        return [{"id": object_id, "name": self.names.get(object_id, object_id)} for _, object_id in node.top[:limit]]
+
+
+def build_autocomplete_index(
+    objects_map: Dict[str, str],
+    objects: Iterable[dict],
+    synonyms: Dict[str, List[str]],
+    popularity: Optional[Dict[str, float]] = None,
+    top_k: int = 10,
+) -> AutocompleteIndex:
+    """
+    Строит индекс подсказок по человекочитаемым названиям, detail объектов и синонимам.
+
+    Args:
+        objects_map: Мапа ID объекта -> человекочитаемое название (get_objects_map)
+        objects: Объекты плана (plan_combined.json)
+        synonyms: Словарь синонимов {ключ: [синонимы]}
+        popularity: Популярность объектов для ранжирования
+        top_k: Сколько подсказок хранить в каждом узле
+    """
+    index = AutocompleteIndex(objects_map, popularity, top_k)
+
+    for object_id, name in objects_map.items():
+        index.add(name, object_id)
+
+    details = {}
+    for obj in objects:
+        if obj["id"] not in objects_map:
+            continue
+        detail = obj["parsed_id"]["detail"].lower()
+        details[obj["id"]] = (obj["parsed_id"]["type"].lower(), detail)
+        index.add(detail, obj["id"])
+
+    # Синоним ведёт к объектам, у которых ключ синонима совпадает с типом или входит в detail
+    for key, values in synonyms.items():
+        key = key.lower()
+        matched = [object_id for object_id, (obj_type, detail) in details.items() if key == obj_type or key in detail]
+        for value in values:
+            for object_id in matched:
+                index.add(value, object_id, tier=1)
+
+    return index.build()
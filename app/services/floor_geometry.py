@@ -0,0 +1,133 @@
+import gzip
+import hashlib
+import json
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from app.services.svg_processor import room_label
+
+SVG_NS = {'svg': 'http://www.w3.org/2000/svg'}
+# Версия формата: клиент сверяет её, прежде чем разбирать массивы
+GEOMETRY_FORMAT_VERSION = 1
+
+
+class EncodedGeometry(NamedTuple):
+    """Геометрия этажа, закодированная один раз на снимок плана."""
+
+    body: bytes
+    gzip_body: bytes
+    etag: str
+
+
+def quantize(values: Iterable[float | str], scale: int) -> List[int]:
+    """Координаты SVG в целые числа с шагом 1 / scale."""
+    return [round(float(value) * scale) for value in values]
+
+
+def split_ids(ids: List[str]) -> Tuple[str, List[str]]:
+    """
+    Общий префикс ID секции (до последнего '_') и хвосты ID без него.
+    Клиент восстанавливает полный ID как prefix + хвост.
+    """
+    prefix = ids[0] if ids else ''
+    for element_id in ids[1:]:
+        while not element_id.startswith(prefix):
+            prefix = prefix[:-1]
+    prefix = prefix[: prefix.rfind('_') + 1]
+    return prefix, [element_id[len(prefix):] for element_id in ids]
+
+
+def rect_section(rects: List[ET.Element], scale: int) -> dict:
+    prefix, ids = split_ids([rect.get('id', '') for rect in rects])
+    coords = []
+    for rect in rects:
+        coords += quantize((rect.get(name, '0') for name in ('x', 'y', 'width', 'height')), scale)
+    return {"prefix": prefix, "ids": ids, "rects": coords}
+
+
+def floor_elements(root: ET.Element, group_id: str, tag: str) -> List[ET.Element]:
+    """Элементы с ID из группы этажа, например прямоугольники '<этаж>_Doors'."""
+    group = root.find(f".//svg:g[@id='{group_id}']", namespaces=SVG_NS)
+    if group is None:
+        return []
+    return [element for element in group.findall(f'svg:{tag}', namespaces=SVG_NS) if element.get('id')]
+
+
+def stairs_section(root: ET.Element, floor: str, scale: int) -> dict:
+    """Лестницы — группы прямоугольников ступеней; на клиент уходит их общий габарит."""
+    group = root.find(f".//svg:g[@id='{floor}_Stairs']", namespaces=SVG_NS)
+    stairs = []
+    for stair in group.findall('svg:g', namespaces=SVG_NS) if group is not None else []:
+        rects = stair.findall('.//svg:rect', namespaces=SVG_NS)
+        if not stair.get('id') or not rects:
+            continue
+        boxes = [[float(rect.get(name, '0')) for name in ('x', 'y', 'width', 'height')] for rect in rects]
+        left, top = min(box[0] for box in boxes), min(box[1] for box in boxes)
+        right, bottom = max(box[0] + box[2] for box in boxes), max(box[1] + box[3] for box in boxes)
+        stairs.append((stair.get('id'), left, top, right - left, bottom - top))
+
+    prefix, ids = split_ids([stair[0] for stair in stairs])
+    coords = []
+    for stair in stairs:
+        coords += quantize(stair[1:], scale)
+    return {"prefix": prefix, "ids": ids, "rects": coords}
+
+
+def lines_section(root: ET.Element, floor: str, scale: int) -> dict:
+    lines = floor_elements(root, f"{floor}_AllowedLines", 'line')
+    prefix, ids = split_ids([line.get('id') for line in lines])
+    coords = []
+    for line in lines:
+        coords += quantize((line.get(name, '0') for name in ('x1', 'y1', 'x2', 'y2')), scale)
+    return {"prefix": prefix, "ids": ids, "coords": coords}
+
+
+def build_floor_geometry(root: ET.Element, floor: str, objects_map: Dict[str, str], scale: int) -> dict:
+    """
+    Векторная геометрия этажа для отрисовки на клиенте: кабинеты, лестницы, двери, разрешённые
+    линии маршрутов и якоря подписей.
+
+    Формат колоночный: у каждой секции общий префикс ID, хвосты ID и плоский массив целых
+    координат (x, y, width, height для прямоугольников, x1, y1, x2, y2 для линий), умноженных
+    на scale. Линии маршрута из ответов API (line_ids) находятся по prefix + хвост в секции lines.
+    """
+    offices = floor_elements(root, f"{floor}_Offices", 'rect')
+    rooms = rect_section(offices, scale)
+    rooms["names"] = [objects_map.get(office.get('id'), '') for office in offices]
+
+    # Подписи те же, что добавляет add_room_labels: текст по центру прямоугольника кабинета
+    labels = {"rooms": [], "texts": [], "anchors": []}
+    for i, office in enumerate(offices):
+        label = room_label(office.get('id'))
+        if label is None:
+            continue
+        x, y, width, height = (float(office.get(name, '0')) for name in ('x', 'y', 'width', 'height'))
+        labels["rooms"].append(i)
+        labels["texts"].append(label)
+        labels["anchors"] += quantize((x + width / 2, y + height / 2), scale)
+
+    return {
+        "version": GEOMETRY_FORMAT_VERSION,
+        "floor": floor,
+        "scale": scale,
+        "rooms": rooms,
+        "stairs": stairs_section(root, floor, scale),
+        "doors": rect_section(floor_elements(root, f"{floor}_Doors", 'rect'), scale),
+        "lines": lines_section(root, floor, scale),
+        "labels": labels,
+    }
+
+
+def encode_geometry(geometry: dict) -> EncodedGeometry:
+    """Компактный JSON, его gzip-версия и ETag по содержимому."""
+    body = json.dumps(geometry, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    # mtime=0, чтобы одинаковая геометрия давала одинаковые байты во всех воркерах
+    gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    return EncodedGeometry(body, gzip_body, etag)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Совпадает ли ETag с заголовком If-None-Match (список тегов, слабые теги W/ или '*')."""
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
@@ -0,0 +1,59 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.metrics import stage
+from app.services.route_service import RouteService
+from app.services.segment_index import SegmentIndex, SegmentSnap
+
+
+class LiveRoute:
+    """
+    Маршрут от меняющейся позиции пользователя до кабинета.
+
+    Дерево кратчайших путей к кабинету берётся из кэша один раз на сессию. На каждое обновление
+    позиция привязывается к ближайшей линии, а маршрут складывается из остатка линии и готового
+    продолжения от её конца. Продолжения запоминаются по линиям, поэтому пока пользователь идёт
+    вдоль линии или возвращается на пройденные, по графу ничего не считается.
+    """
+
+    def __init__(self, service: RouteService, segment_index: SegmentIndex, office_b_id: str):
+        doors = service.repository.get_doors_by_office_id(office_b_id)
+        if not doors:
+            raise ValueError(f"Кабинет B с ID '{office_b_id}' не найден или у него нет дверей.")
+        if service.tree_cache is None:
+            raise ValueError("Маршруты от точки недоступны: кэш деревьев путей выключен.")
+        self.service = service
+        self.segment_index = segment_index
+        self.office_b_id = office_b_id
+        self.tree, self.cache_hit = service.tree_cache.tree(office_b_id, doors)
+        if self.tree is None:
+            raise ValueError(f"Двери кабинета '{office_b_id}' отсутствуют в графе маршрутов.")
+        self._options: Dict[str, Dict[str, Tuple[float, List[str]]]] = {}
+        self._path: Optional[List[str]] = None
+
+    def update(self, floor: str, x: float, y: float) -> Dict[str, Any]:
+        with stage("route_from_point", "snap"):
+            snap = self.segment_index.nearest(floor, x, y)
+        if snap is None:
+            raise ValueError(f"На этаже '{floor}' нет линий маршрутов.")
+
+        with stage("route_from_point", "route"):
+            options = self._options.get(snap.line_id)
+            recomputed = options is None
+            if recomputed:
+                options = self._options[snap.line_id] = self.service.point_route_options(
+                    snap.start, snap.end, self.tree
+                )
+            route = self.service.point_route(snap, options)
+
+        path_changed = route["path"] != self._path
+        self._path = route["path"]
+        return {
+            "route": route,
+            "snap": snap_to_dict(snap),
+            "path_changed": path_changed,
+            "recomputed": recomputed,
+        }
+
+
+def snap_to_dict(snap: SegmentSnap) -> Dict[str, Any]:
+    return {"line_id": snap.line_id, "x": snap.x, "y": snap.y, "distance": snap.distance}
@@ -0,0 +1,71 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class PlanReloader:
+    """
+    Следит за манифестом регенерации плана (scripts/cli_svg_to_json.py --manifest).
+
+    Манифест хранит хэш содержимого каждого этажа. Когда файл меняется, изменённые этажи
+    определяются по сравнению с хэшами, которые видел этот воркер, и передаются в on_change.
+    """
+
+    def __init__(self, manifest_path: str, interval: float, on_change: Callable[[List[str]], None]):
+        self.manifest_path = manifest_path
+        self.interval = interval
+        self.on_change = on_change
+        self._mtime = self.mtime()
+        manifest = self.read()
+        self.floors: Dict[str, str] = manifest.get("floors", {}) if manifest else {}
+        self._thread: Optional[threading.Thread] = None
+
+    def mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.manifest_path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def read(self) -> Optional[dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def check(self) -> List[str]:
+        """Перечитывает манифест, если он изменился, и возвращает изменённые этажи."""
+        mtime = self.mtime()
+        if mtime is None or mtime == self._mtime:
+            return []
+        manifest = self.read()
+        if manifest is None:
+            # Файл мог быть прочитан во время записи: попробуем в следующий раз
+            return []
+        self._mtime = mtime
+
+        floors = manifest.get("floors", {})
+        changed = [floor for floor, content_hash in floors.items() if self.floors.get(floor) != content_hash]
+        changed += [floor for floor in self.floors if floor not in floors]
+        self.floors = floors
+        if changed:
+            self.on_change(changed)
+        return changed
+
+    def start(self):
+        """Запускает фоновую проверку манифеста. Вызывается в каждом воркере после fork."""
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Ошибка при перезагрузке плана: {str(e)}")
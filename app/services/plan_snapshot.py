@@ -0,0 +1,27 @@
+from typing import List, NamedTuple
+
+import numpy as np
+
+from app.services.spatial_index import SpatialIndex
+from app.utils.text_processing import build_time_relevance_table
+
+
+class PlanSnapshot(NamedTuple):
+    """
+    Объекты плана и построенные по ним структуры поиска. Номера объектов в пространственном
+    индексе и столбцы таблицы актуальности указывают в этот же список data, поэтому снимок
+    публикуется целиком одной ссылкой, а обработчик берёт её один раз на запрос.
+    """
+
+    data: List[dict]
+    spatial_index: SpatialIndex
+    time_table: np.ndarray
+
+
+def build_plan_snapshot(data: List[dict]) -> PlanSnapshot:
+    return PlanSnapshot(data, SpatialIndex(data), build_time_relevance_table(data))
+
+
+def reload_plan_snapshot(plan: PlanSnapshot, data: List[dict], changed_floors: List[str]) -> PlanSnapshot:
+    """Снимок для регенерированного плана: деревья неизменённых этажей берутся из старого."""
+    return PlanSnapshot(data, plan.spatial_index.updated(data, changed_floors), build_time_relevance_table(data))
@@ -1,25 +1,125 @@
+import math
+import threading
+from collections import OrderedDict
 from heapq import nsmallest
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import networkx as nx
 
+from app.core.metrics import record_cache
 from app.repositories.graph_repository import GraphRepository
+from app.services.route_tree_cache import RouteTree, RouteTreeCache
+from app.services.segment_index import SegmentSnap
+
+
+def chain_from(G: nx.Graph, start: str, first: str, contractible: Set[str]) -> Tuple[List[str], str]:
+    """Идёт от start через first по узлам степени 2; возвращает пройденные узлы цепочки и её конец."""
+    chain, previous, node = [], start, first
+    while node in contractible and node != start:
+        chain.append(node)
+        previous, node = node, next(neighbor for neighbor in G[node] if neighbor != previous)
+    return chain, node
+
+
+def contract_chains(G: nx.Graph, keep: Iterable[str]) -> nx.Graph:
+    """
+    Стягивает цепочки проходных пересечений (ровно два соседа) в одно ребро.
+
+    Ребро цепочки получает сумму весов, упорядоченный от 'source' список line_id и промежуточные
+    узлы в 'via', чтобы путь можно было развернуть обратно. Узлы из keep (двери — начала и концы
+    маршрутов) не стягиваются. Цепочка остаётся как есть, если её концы совпадают или уже соединены
+    ребром: в nx.Graph нет параллельных рёбер, а без них простые пути совпадают с исходными.
+    """
+    keep = set(keep)
+    contractible = {node for node in G if node not in keep and G.degree(node) == 2 and node not in G[node]}
+    H = G.copy()
+    visited = set()
+    # (конец цепочки, первый узел цепочки) -> другой конец: соседи на месте стянутых узлов
+    replaced = {}
+    for node in G:
+        if node not in contractible or node in visited:
+            continue
+        left, right = list(G[node])
+        # Цепочка от одного конца до другого: u - ...left... - node - ...right... - v
+        left_chain, u = chain_from(G, node, left, contractible)
+        right_chain, v = chain_from(G, node, right, contractible)
+        chain = list(reversed(left_chain)) + [node] + right_chain
+        visited.update(chain)
+        if u == v or u in visited or H.has_edge(u, v):
+            # Петля, замкнутый цикл из проходных узлов или параллельное ребро
+            continue
+
+        nodes = [u] + chain + [v]
+        weight, line_ids = 0, []
+        for a, b in zip(nodes, nodes[1:]):
+            edge_data = G.get_edge_data(a, b)
+            weight += edge_data.get('weight', 1)
+            line_id = edge_data.get('line_id')
+            line_ids.extend(line_id if isinstance(line_id, list) else [line_id])
+        H.remove_nodes_from(chain)
+        H.add_edge(u, v, weight=weight, line_id=line_ids, via=chain, source=u)
+        replaced[(u, chain[0])] = v
+        replaced[(v, chain[-1])] = u
+
+    # Дейкстра и алгоритм Йена разрешают равные по весу пути порядком соседей: стянутое ребро
+    # ставится на место первого узла цепочки, чтобы среди равных маршрутов выбирались те же
+    for node, neighbors in H._adj.items():
+        order = [replaced.get((node, neighbor), neighbor) for neighbor in G[node]]
+        H._adj[node] = {neighbor: neighbors[neighbor] for neighbor in order if neighbor in neighbors}
+    return H
 
 
 class RouteService:
-    def __init__(self, repository: GraphRepository):
+    # Сколько наборов расстояний от разных точек старта держать в памяти
+    DISTANCE_CACHE_SIZE = 256
+
+    def __init__(self, repository: GraphRepository, contract: bool = False, tree_cache_bytes: int = 0):
         self.repository = repository
-        self.G = self.repository.graph
+        if contract:
+            doors = [door.id for obj in self.repository.data.objects for door in obj.doors]
+            self.G = contract_chains(self.repository.graph, doors)
+        else:
+            self.G = self.repository.graph
+        # Кэш читают и пишут поток event loop и потоки пакетного поиска
+        self._distance_cache: OrderedDict = OrderedDict()
+        self._distance_cache_lock = threading.Lock()
+        # Деревья кратчайших путей к популярным кабинетам; 0 — без кэша
+        self.tree_cache = RouteTreeCache(self.G, tree_cache_bytes) if tree_cache_bytes > 0 else None
+        # Стянутый узел -> (узлы его цепочки от конца до конца, позиция в ней)
+        self._chains: Dict[str, Tuple[List[str], int]] = {}
+        for u, v, edge_data in self.G.edges(data=True):
+            if edge_data.get('via'):
+                source = edge_data['source']
+                nodes = [source] + edge_data['via'] + [v if source == u else u]
+                for position in range(1, len(nodes) - 1):
+                    self._chains[nodes[position]] = (nodes, position)
+
+    def edge_segments(self, a: str, b: str) -> Tuple[List[str], List[Any]]:
+        """Промежуточные узлы и line_id ребра (a, b) в направлении от a к b."""
+        edge_data = self.G.get_edge_data(a, b) or {}
+        via = edge_data.get('via', [])
+        line_id = edge_data.get('line_id')
+        line_ids = line_id if isinstance(line_id, list) else [line_id]
+        if edge_data.get('source', a) != a:
+            return list(reversed(via)), list(reversed(line_ids))
+        return list(via), list(line_ids)
+
+    def expand_path(self, path: List[str]) -> List[str]:
+        """Путь по стянутому графу с восстановленными промежуточными пересечениями."""
+        if not path:
+            return path
+        expanded = [path[0]]
+        for a, b in zip(path, path[1:]):
+            expanded.extend(self.edge_segments(a, b)[0])
+            expanded.append(b)
+        return expanded
 
     def extract_line_ids(self, path: List[str]) -> List[Any]:
         line_ids = []
         for i in range(len(path) - 1):
-            edge_data = self.G.get_edge_data(path[i], path[i + 1])
-            if edge_data:
-                line_id = edge_data.get('line_id')
-                if isinstance(line_id, list):
-                    line_id = line_id[0]
-                line_ids.append(line_id)
+            if self.G.has_edge(path[i], path[i + 1]):
+                # Стянутое ребро разворачивается во все свои линии по порядку
+                line_ids.extend(self.edge_segments(path[i], path[i + 1])[1])
         return line_ids
 
     def compute_path_weight(self, path: List[str]) -> float:
@@ -32,7 +132,82 @@ class RouteService:
                 total_weight += 1
         return total_weight
 
-    def find_top_k_paths(self, office_a_id: str, office_b_id: str, top_k: int = 3) -> List[Dict[str, Any]]:
+    def exits(self, node: str) -> List[List[str]]:
+        """
+        Пути по исходному графу от узла до узлов, где продолжается поиск по стянутому графу:
+        сам узел или оба конца его цепочки.
+        """
+        if node in self.G:
+            return [[node]]
+        nodes, position = self._chains[node]
+        return [nodes[position::-1], nodes[position:]]
+
+    def full_path_weight(self, path: List[str]) -> float:
+        """Длина пути по исходному (не стянутому) графу."""
+        graph = self.repository.graph
+        return sum(graph[a][b].get('weight', 1) for a, b in zip(path, path[1:]))
+
+    def point_route_options(self, start: str, end: str, tree: RouteTree) -> Dict[str, Tuple[float, List[str]]]:
+        """
+        Лучшие продолжения маршрута от концов линии, к которой привязан пользователь:
+        {конец: (расстояние от него до кабинета, путь по исходному графу)}. Они не зависят
+        от положения на линии, поэтому при движении вдоль неё не пересчитываются.
+        """
+        options = {}
+        for node in (start, end):
+            best = None
+            for walk in self.exits(node):
+                cost = self.full_path_weight(walk) + float(tree.distances[self.tree_cache.index[walk[-1]]])
+                if math.isfinite(cost) and (best is None or cost < best[0]):
+                    best = (cost, walk)
+            if best is not None:
+                cost, walk = best
+                options[node] = (cost, walk[:-1] + self.expand_path(self.tree_cache.path(tree, [walk[-1]])))
+        return options
+
+    def point_route(self, snap: SegmentSnap, options: Dict[str, Tuple[float, List[str]]]) -> Dict[str, Any]:
+        """
+        Маршрут от точки на линии: ребро линии виртуально делится точкой, и путь идёт через
+        тот конец, от которого вместе с остатком линии до кабинета ближе.
+        """
+        graph = self.repository.graph
+        weight = graph[snap.start][snap.end].get('weight', 1)
+        offsets = {snap.start: snap.fraction * weight, snap.end: (1 - snap.fraction) * weight}
+        candidates = [(offsets[node] + cost, node) for node, (cost, _) in options.items()]
+        if not candidates:
+            raise ValueError("Маршрут от точки до кабинета не найден.")
+        total_weight, node = min(candidates, key=lambda candidate: candidate[0])
+        path = options[node][1]
+        line_ids = [snap.line_id] + [graph[a][b].get('line_id') for a, b in zip(path, path[1:])]
+        return {"path": path, "line_ids": line_ids, "total_weight": total_weight}
+
+    def walking_distances(self, sources: List[str], cutoff: Optional[float] = None) -> Dict[str, float]:
+        """
+        Расстояния пешком от ближайшего из sources до всех узлов графа.
+        Один ограниченный по cutoff проход Дейкстры на точку старта, результат кэшируется (LRU).
+        """
+        sources = sorted(source for source in set(sources) if source in self.G)
+        if not sources:
+            return {}
+        key = (tuple(sources), cutoff)
+        with self._distance_cache_lock:
+            distances = self._distance_cache.get(key)
+            if distances is not None:
+                self._distance_cache.move_to_end(key)
+        record_cache("walking_distance", distances is not None)
+        if distances is not None:
+            return distances
+
+        # Дейкстра выполняется без блокировки: параллельный промах по тому же ключу лишь посчитает его ещё раз
+        distances = nx.multi_source_dijkstra_path_length(self.G, sources, cutoff=cutoff, weight='weight')
+        with self._distance_cache_lock:
+            self._distance_cache[key] = distances
+            self._distance_cache.move_to_end(key)
+            if len(self._distance_cache) > self.DISTANCE_CACHE_SIZE:
+                self._distance_cache.popitem(last=False)
+        return distances
+
+    def get_office_doors(self, office_a_id: str, office_b_id: str) -> Tuple[List[str], List[str]]:
         doors_a = self.repository.get_doors_by_office_id(office_a_id)
         doors_b = self.repository.get_doors_by_office_id(office_b_id)
 
@@ -40,6 +215,41 @@ class RouteService:
             raise ValueError(f"Кабинет A с ID '{office_a_id}' не найден или у него нет дверей.")
         if not doors_b:
             raise ValueError(f"Кабинет B с ID '{office_b_id}' не найден или у него нет дверей.")
+        return doors_a, doors_b
+
+    def warm_route_trees(self, office_ids: List[str]) -> int:
+        """Заранее строит деревья путей к кабинетам (например, самым частым назначениям из лога)."""
+        if self.tree_cache is None:
+            return 0
+        for office_id in office_ids:
+            doors = self.repository.get_doors_by_office_id(office_id)
+            if doors:
+                self.tree_cache.tree(office_id, doors)
+        return len(self.tree_cache)
+
+    def find_shortest_path(self, office_a_id: str, office_b_id: str) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Один кратчайший маршрут через дерево путей к кабинету B из кэша, без поиска по графу.
+        Возвращает маршрут в формате find_top_k_paths и признак попадания в кэш.
+        """
+        doors_a, doors_b = self.get_office_doors(office_a_id, office_b_id)
+        if self.tree_cache is None:
+            return self.find_top_k_paths(office_a_id, office_b_id, 1), False
+
+        tree, cache_hit = self.tree_cache.tree(office_b_id, doors_b)
+        # Как и в find_top_k_paths, общая дверь кабинетов не считается маршрутом
+        path = self.tree_cache.path(tree, [door for door in doors_a if door not in doors_b]) if tree else None
+        if path is None:
+            raise ValueError("Маршруты от кабинета A до кабинета B не найдены.")
+        route = {
+            "path": self.expand_path(path),
+            "line_ids": self.extract_line_ids(path),
+            "total_weight": self.compute_path_weight(path),
+        }
+        return [route], cache_hit
+
+    def find_top_k_paths(self, office_a_id: str, office_b_id: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        doors_a, doors_b = self.get_office_doors(office_a_id, office_b_id)
 
         all_top_paths: List[Tuple[List[str], float]] = []
 
@@ -67,7 +277,9 @@ class RouteService:
             path_tuple = tuple(path)
             if path_tuple not in seen_paths:
                 seen_paths.add(path_tuple)
-                unique_top_paths.append({"path": path, "line_ids": self.extract_line_ids(path), "total_weight": weight})
+                unique_top_paths.append(
+                    {"path": self.expand_path(path), "line_ids": self.extract_line_ids(path), "total_weight": weight}
+                )
             if len(unique_top_paths) == top_k:
                 break
 
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+from app.core.metrics import record_cache
+
+# Так scipy отмечает корень дерева кратчайших путей в массиве предшественников
+NO_PREDECESSOR = -9999
+
+
+class RouteTree:
+    """Обратное дерево кратчайших путей к дверям одного кабинета: расстояние и следующий узел к нему."""
+
+    __slots__ = ("distances", "predecessors")
+
+    def __init__(self, distances: np.ndarray, predecessors: np.ndarray):
+        self.distances = distances
+        self.predecessors = predecessors
+
+    @property
+    def nbytes(self) -> int:
+        return self.distances.nbytes + self.predecessors.nbytes
+
+
+class RouteTreeCache:
+    """
+    Кэш деревьев кратчайших путей к популярным кабинетам назначения (столовая, спортзал, гардероб).
+
+    Дерево строится лениво одним проходом Дейкстры от всех дверей кабинета по CSR-матрице графа
+    (граф неориентированный, поэтому это и есть дерево путей к кабинету). Маршрут из любой точки
+    к кабинету из кэша — проход по массиву предшественников без поиска. Деревья вытесняются
+    по LRU, когда их суммарный размер превышает max_bytes.
+    """
+
+    def __init__(self, graph: nx.Graph, max_bytes: int):
+        self.graph = graph
+        self.max_bytes = max_bytes
+        self.nodes: List[str] = list(graph.nodes)
+        self.index: Dict[str, int] = {node: i for i, node in enumerate(self.nodes)}
+        self._matrix = None
+        self._trees: OrderedDict = OrderedDict()
+        self.nbytes = 0
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = nx.to_scipy_sparse_array(self.graph, nodelist=self.nodes, weight='weight', format='csr')
+        return self._matrix
+
+    def __len__(self) -> int:
+        return len(self._trees)
+
+    def tree(self, office_id: str, doors: List[str]) -> Tuple[Optional[RouteTree], bool]:
+        """Дерево путей к дверям кабинета и признак попадания в кэш. None, если дверей нет в графе."""
+        tree = self._trees.get(office_id)
+        record_cache("route_tree", tree is not None)
+        if tree is not None:
+            self._trees.move_to_end(office_id)
+            return tree, True
+
+        indices = [self.index[door] for door in doors if door in self.index]
+        if not indices:
+            return None, False
+        from scipy.sparse.csgraph import dijkstra
+
+        distances, predecessors, _ = dijkstra(
+            self.matrix, directed=False, indices=indices, return_predecessors=True, min_only=True
+        )
+        tree = RouteTree(distances, predecessors.astype(np.int32))
+        self._trees[office_id] = tree
+        self.nbytes += tree.nbytes
+        while self.nbytes > self.max_bytes and len(self._trees) > 1:
+            _, evicted = self._trees.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+        return tree, False
+
+    def path(self, tree: RouteTree, origins: List[str]) -> Optional[List[str]]:
+        """Кратчайший путь от ближайшей из origins до кабинета дерева; None, если он недостижим."""
+        indices = [self.index[origin] for origin in origins if origin in self.index]
+        if not indices:
+            return None
+        distances = tree.distances[indices]
+        best = int(np.argmin(distances))
+        if not np.isfinite(distances[best]):
+            return None
+
+        node = indices[best]
+        path = [self.nodes[node]]
+        while tree.predecessors[node] != NO_PREDECESSOR:
+            node = int(tree.predecessors[node])
+            path.append(self.nodes[node])
+        return path
@@ -1,113 +1,321 @@
 import json
-import math
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+from rapidfuzz.fuzz import partial_ratio
+from rapidfuzz.process import cdist
+
+from app.core.config import settings
+from app.core.metrics import stage
 from app.models.userContext import Location, UserContext
 from app.services.cache import SearchCache
+from app.services.route_service import RouteService
+from app.services.spatial_index import SpatialIndex, floor_key
 from app.utils.ranker import PopularityRanker
 from app.utils.text_processing import (
+    MAX_DISTANCE,
+    RELEVANCE_WEIGHTS,
     advanced_normalize_text_with_stemming,
-    calculate_relevance,
+    calculate_distance,
+    euclidean_distance,
     expand_synonyms,
-    fuzzy_match,
+    get_time_relevance,
     handle_translit,
     handle_typos,
+    is_known_phrase,
+    layout_variants,
+    normalize_distance,
+    time_bucket,
 )
 
+# Порог нечеткого совпадения по partial_ratio
+FUZZY_THRESHOLD = 80
+# Близость объекта, не достижимого пешком от пользователя (как у самого дальнего объекта)
+UNREACHABLE_LOCATION_RELEVANCE = 0.1
+# Близость, когда расстояние до объекта неизвестно
+NEUTRAL_LOCATION_RELEVANCE = 0.5
+
 
 def load_data(filepath: str):
     with open(filepath, "r", encoding="utf-8") as f:
         return json.load(f)["objects"]
 
 
+def normalize_query_variants(query: str) -> List[str]:
+    """
+    Полная обработка запроса: транслит, стемминг, опечатки и синонимы.
+
+    Если запрос набран в неправильной раскладке, обрабатывается и его вариант в другой раскладке.
+    Вариант берётся, только если он состоит из известных слов, а исходный запрос — нет.
+    Все варианты затем оцениваются одним проходом, объекту засчитывается лучший.
+    """
+    with stage("search", "translit"):
+        variants = [handle_translit(variant) for variant in layout_variants(query)]
+    with stage("search", "stemming"):
+        stemmed = [advanced_normalize_text_with_stemming(variant) for variant in variants]
+    if len(stemmed) > 1 and (is_known_phrase(stemmed[0]) or not is_known_phrase(stemmed[1])):
+        stemmed = stemmed[:1]
+    with stage("search", "symspell"):
+        corrected = [handle_typos(variant) for variant in stemmed]
+    with stage("search", "synonyms"):
+        return list(dict.fromkeys(expand_synonyms(variant, settings.synonyms_file_path) for variant in corrected))
+
+
+def get_walking_distances(
+    data: list[dict],
+    route_service: RouteService,
+    user_office_id: Optional[str] = None,
+    user_floor: Optional[str] = None,
+    location: Optional[Location] = None,
+    spatial_index: Optional[SpatialIndex] = None,
+) -> Dict[str, float]:
+    """
+    Пешее расстояние по графу от пользователя до каждого объекта (до ближайшей его двери).
+
+    Точка старта — двери кабинета пользователя, а если он не указан — ближайшая
+    к координатам пользователя дверь на его этаже. Для всех кандидатов выполняется
+    один ограниченный проход Дейкстры, а не построение маршрута до каждого.
+    """
+    sources, offset = [], 0.0
+    if user_office_id:
+        sources = route_service.repository.get_doors_by_office_id(user_office_id)
+    elif spatial_index is not None and user_floor and location is not None:
+        nearest = spatial_index.nearest_door(user_floor, location.x, location.y)
+        if nearest is not None:
+            door_id, offset = nearest
+            sources = [door_id]
+    if not sources:
+        return {}
+
+    node_distances = route_service.walking_distances(sources, settings.search_walking_distance_cutoff)
+    distances = {}
+    for obj in data:
+        door_distances = [node_distances[door["id"]] for door in obj.get("doors", []) if door["id"] in node_distances]
+        if door_distances:
+            distances[obj["id"]] = min(door_distances) + offset
+    return distances
+
+
+def get_context_factors(
+    data: list[dict],
+    user_floor: Optional[str],
+    user_context: Optional[UserContext],
+    spatial_index: Optional[SpatialIndex] = None,
+    route_service: Optional[RouteService] = None,
+    user_office_id: Optional[str] = None,
+    time_table: Optional[np.ndarray] = None,
+    radius: Optional[float] = None,
+) -> Tuple[List[int], np.ndarray, np.ndarray, List[Optional[float]]]:
+    """
+    Считает факторы, не зависящие от текста запроса, один раз на запрос или пачку.
+
+    Возвращает индексы кандидатов (с отсечением по радиусу), актуальность по времени,
+    близость к пользователю и расстояние для ответа по каждому объекту.
+    """
+    location = user_context.location if user_context else None
+    user_floor_key = floor_key(user_floor) if user_floor else None
+
+    # Отсечение по радиусу через пространственный индекс до нечеткого сравнения
+    candidates = list(range(len(data)))
+    nearby: Dict[int, float] = {}
+    max_distance = MAX_DISTANCE
+    if spatial_index is not None and user_floor and location is not None:
+        max_distance = spatial_index.max_distance(user_floor)
+        if radius is not None:
+            nearby = spatial_index.within(user_floor, location.x, location.y, radius)
+            candidates = list(nearby)
+
+    # Пешие расстояния позволяют ранжировать объекты со всех этажей
+    walking_distances = {}
+    if route_service is not None:
+        walking_distances = get_walking_distances(
+            data, route_service, user_office_id, user_floor, location, spatial_index
+        )
+    max_walking_distance = max(walking_distances.values(), default=0.0) or MAX_DISTANCE
+
+    # Актуальность по времени берётся строкой из предвычисленной таблицы
+    time_relevance = np.ones(len(data))
+    if user_context and time_table is not None:
+        time_relevance = time_table[time_bucket(user_context.time)]
+    elif user_context:
+        time_relevance = np.array([get_time_relevance(obj, user_context.time) for obj in data])
+
+    # Прямое расстояние имеет смысл только на этаже пользователя: координаты этажей не связаны.
+    # Если пешие расстояния посчитаны, объект без них недостижим или дальше отсечки.
+    location_relevance = np.full(len(data), NEUTRAL_LOCATION_RELEVANCE)
+    distances: List[Optional[float]] = [None] * len(data)
+    for i in candidates:
+        obj = data[i]
+        walking_distance = walking_distances.get(obj["id"])
+        if walking_distance is not None:
+            location_relevance[i] = normalize_distance(walking_distance, max_walking_distance)
+            distances[i] = walking_distance
+        elif walking_distances:
+            location_relevance[i] = UNREACHABLE_LOCATION_RELEVANCE
+        elif location is not None and floor_key(obj["parsed_id"]["floor"]) == user_floor_key:
+            location_relevance[i] = calculate_distance(location, obj["position"], max_distance)
+            distances[i] = nearby.get(i, euclidean_distance(location, obj["position"]))
+
+    return candidates, time_relevance, location_relevance, distances
+
+
+def rank_matches(
+    variant_groups: List[List[str]],
+    data: list[dict],
+    candidates: List[int],
+    time_relevance: np.ndarray,
+    location_relevance: np.ndarray,
+    distances: List[Optional[float]],
+    popularity_ranker: PopularityRanker,
+    workers: int = 1,
+) -> List[list]:
+    """
+    Оценивает группы вариантов запросов против кандидатов одной матрицей cdist.
+    Для каждой группы объекту засчитывается лучший из её вариантов.
+    """
+    if not candidates or not variant_groups:
+        return [[] for _ in variant_groups]
+
+    variants = [variant for group in variant_groups for variant in group]
+    types = [data[i]["parsed_id"]["type"].lower() for i in candidates]
+    details = [data[i]["parsed_id"]["detail"].lower() for i in candidates]
+    raw_details = [data[i]["parsed_id"]["detail"] for i in candidates]
+
+    with stage("search", "fuzzy_scoring"):
+        matched = (cdist(variants, types, scorer=partial_ratio, workers=workers) > FUZZY_THRESHOLD) | (
+            cdist(variants, details, scorer=partial_ratio, workers=workers) > FUZZY_THRESHOLD
+        )
+        # Пустой запрос входит в любую строку
+        matched[[row for row, variant in enumerate(variants) if not variant]] = True
+        text_similarity = cdist(variants, raw_details, scorer=partial_ratio, workers=workers) / 100
+
+        relevance = (
+            text_similarity * RELEVANCE_WEIGHTS["text"]
+            + time_relevance[candidates] * RELEVANCE_WEIGHTS["time"]
+            + location_relevance[candidates] * RELEVANCE_WEIGHTS["location"]
+        )
+        relevance = np.where(matched, relevance, -np.inf)
+
+    with stage("search", "sort"):
+        return collect_results(variant_groups, data, candidates, relevance, distances, popularity_ranker)
+
+
+def collect_results(
+    variant_groups: List[List[str]],
+    data: list[dict],
+    candidates: List[int],
+    relevance: np.ndarray,
+    distances: List[Optional[float]],
+    popularity_ranker: PopularityRanker,
+) -> List[list]:
+    """Отбирает объекты с релевантностью выше порога и сортирует их для каждой группы вариантов."""
+    results_by_group = []
+    row = 0
+    for group in variant_groups:
+        # Лучший вариант запроса для каждого кандидата
+        best = relevance[row : row + len(group)].max(axis=0)
+        row += len(group)
+
+        results = []
+        for column in np.flatnonzero(best > 0.5).tolist():
+            index = candidates[column]
+            obj = data[index]
+            result = {
+                "id": obj["id"],
+                "relevance": float(best[column]),
+                "popularity": popularity_ranker.get_popularity_score(obj["id"]),
+                "floor": obj["parsed_id"]["floor"],
+                "type": obj["parsed_id"]["type"],
+                "detail": obj["parsed_id"]["detail"],
+                "position": obj["position"],
+            }
+            if distances[index] is not None:
+                result["distance"] = distances[index]
+            results.append(result)
+
+        # Сортировка с учетом всех факторов
+        results.sort(key=lambda x: (-x["relevance"], -x["popularity"], x.get("distance", float('inf'))))
+        results_by_group.append(results)
+
+    return results_by_group
+
+
 # Основная функция поиска
-def search_entities(query: str, user_floor: str, user_context: Optional[UserContext], data: list[dict]):
+def search_entities(
+    query: str,
+    user_floor: Optional[str],
+    user_context: Optional[UserContext],
+    data: list[dict],
+    spatial_index: Optional[SpatialIndex] = None,
+    radius: Optional[float] = None,
+    popularity_ranker: Optional[PopularityRanker] = None,
+    route_service: Optional[RouteService] = None,
+    user_office_id: Optional[str] = None,
+    time_table: Optional[np.ndarray] = None,
+):
     # Инициализация компонентов
     cache = SearchCache()
-    popularity_ranker = PopularityRanker()
+    if popularity_ranker is None:
+        popularity_ranker = PopularityRanker([])
 
     # Проверка кэша
-    cache_key = f"{query}:{user_floor}"
+    cache_key = f"{query}:{user_floor}:{radius}:{user_office_id}"
     if user_context:
         cache_key += f":{user_context.time}:{user_context.location.x}:{user_context.location.y}"
-        cached_result = cache.get(cache_key)
-        if cached_result:
-            return cached_result
+    cached_result = cache.get(cache_key)
+    if cached_result:
+        return cached_result
 
-        # Обработка запроса
-        query = advanced_normalize_text_with_stemming(handle_translit(query))
-        query = handle_typos(query)
-        query = expand_synonyms(query, 'data/synonyms.json')
+    # Обработка запроса
+    variants = normalize_query_variants(query)
 
-        results = []
-        for obj in data:
-            obj_type = obj["parsed_id"]["type"].lower()
-            obj_detail = obj["parsed_id"]["detail"].lower()
-            obj_floor = obj["parsed_id"]["floor"].lower()
-
-            if fuzzy_match(query, obj_type) or fuzzy_match(query, obj_detail):
-                if user_floor.lower() == obj_floor:
-                    relevance = calculate_relevance(query, obj, user_context)
-                    popularity = popularity_ranker.get_popularity_score(obj["id"])
-
-                    if relevance > 0.5:
-                        result = {
-                            "id": obj["id"],
-                            "relevance": relevance,
-                            "popularity": popularity,
-                            "floor": obj["parsed_id"]["floor"],
-                            "type": obj["parsed_id"]["type"],
-                            "detail": obj["parsed_id"]["detail"],
-                            "position": obj["position"],
-                        }
-
-                        if user_context and user_context.location:
-                            distance = calculate_distance(user_context.location, obj["position"])
-                            result["distance"] = distance
-
-                        results.append(result)
-
-        # Сортировка с учетом всех факторов
-        results.sort(
-            key=lambda x: (
-                x["floor"] != user_floor if user_floor else False,
-                -x["relevance"],
-                -x["popularity"],
-                x.get("distance", float('inf')) if user_context and user_context.location else 0,
-            )
+    with stage("search", "context"):
+        candidates, time_relevance, location_relevance, distances = get_context_factors(
+            data, user_floor, user_context, spatial_index, route_service, user_office_id, time_table, radius
         )
+    results = rank_matches(
+        [variants], data, candidates, time_relevance, location_relevance, distances, popularity_ranker
+    )[0]
 
-        # Кэширование результата
-        cache.set(cache_key, results)
+    # Кэширование результата
+    cache.set(cache_key, results)
 
-        return results
+    return results
 
 
-def calculate_distance(location1: Location, location2: dict) -> float:
+def search_entities_batch(
+    queries: List[str],
+    user_floor: Optional[str],
+    user_context: Optional[UserContext],
+    data: list[dict],
+    spatial_index: Optional[SpatialIndex] = None,
+    popularity_ranker: Optional[PopularityRanker] = None,
+    route_service: Optional[RouteService] = None,
+    user_office_id: Optional[str] = None,
+    time_table: Optional[np.ndarray] = None,
+    workers: int = 1,
+) -> List[list]:
     """
-    Рассчитывает нормализованное расстояние между двумя точками.
-
-    Параметры:
-    - location1: словарь с координатами {"x": float, "y": float}
-    - location2: словарь с координатами {"x": float, "y": float}
+    Поиск по пачке запросов с тем же ранжированием, что и search_entities.
 
-    Возвращает:
-    float: нормализованное значение расстояния от 0 до 1 (где 1 - ближайшее расположение)
+    Каждый уникальный запрос нормализуется один раз (стемминг токенов кэшируется),
+    текстовое сходство всех запросов со всеми объектами считается одной матрицей cdist,
+    а факторы, не зависящие от запроса (время, близость, популярность), — один раз на пачку.
+    Возвращает списки результатов в порядке запросов.
     """
-    try:
-        # Евклидово расстояние
-        dx = location1.x - location2["x"]
-        dy = location1.y - location2["y"]
-        distance = math.sqrt(dx * dx + dy * dy)
+    if popularity_ranker is None:
+        popularity_ranker = PopularityRanker([])
 
-        # Нормализация расстояния
-        # Предполагаем, что максимальное расстояние в здании = 100 единиц
-        MAX_DISTANCE = 100.0
+    unique_queries = list(dict.fromkeys(queries))
+    variant_groups = [normalize_query_variants(query) for query in unique_queries]
 
-        # Преобразуем расстояние в оценку релевантности (1 - близко, 0 - далеко)
-        relevance = 1 - min(distance / MAX_DISTANCE, 1)
-
-        return max(0.1, relevance)  # Минимальная релевантность 0.1
+    with stage("search", "context"):
+        candidates, time_relevance, location_relevance, distances = get_context_factors(
+            data, user_floor, user_context, spatial_index, route_service, user_office_id, time_table
+        )
+    unique_results = rank_matches(
+        variant_groups, data, candidates, time_relevance, location_relevance, distances, popularity_ranker, workers
+    )
 
-    except (KeyError, TypeError):
-        return 0.5  # В случае ошибки возвращаем среднее значение
+    results_by_query = dict(zip(unique_queries, unique_results))
+    return [results_by_query[query] for query in queries]
@@ -0,0 +1,118 @@
+import xml.etree.ElementTree as ET
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.services.spatial_index import floor_key
+
+SVG_NS = {'svg': 'http://www.w3.org/2000/svg'}
+# До такого числа линий на этаже полный векторный перебор быстрее запросов к KD-дереву
+LINEAR_SCAN_LIMIT = 1000
+
+
+class SegmentSnap(NamedTuple):
+    """Проекция точки на ближайшую разрешённую линию."""
+
+    line_id: str
+    start: str  # узел графа в начале линии (x1, y1)
+    end: str  # узел графа в конце линии (x2, y2)
+    fraction: float  # положение проекции: 0 — start, 1 — end
+    distance: float  # от точки до линии
+    x: float
+    y: float
+
+
+class FloorSegments:
+    """
+    KD-дерево по серединам отрезков одного этажа.
+
+    Отрезок с серединой m и половиной длины h не ближе к точке, чем |p - m| - h. Поэтому после
+    ближайшей середины (расстояние до её отрезка d) достаточно проверить отрезки с серединами
+    в радиусе d + max(h) — остальные заведомо дальше.
+    """
+
+    def __init__(self, segments: List[Tuple[str, str, str, float, float, float, float]]):
+        from scipy.spatial import cKDTree
+
+        # segments: [(line_id, start, end, x1, y1, x2, y2)]
+        self.line_ids = [segment[0] for segment in segments]
+        self.starts = [segment[1] for segment in segments]
+        self.ends = [segment[2] for segment in segments]
+        coords = np.array([segment[3:] for segment in segments], dtype=float)
+        self.x1, self.y1, self.x2, self.y2 = coords.T
+        self.all_indices = np.arange(len(segments))
+        self.tree = cKDTree(np.column_stack(((self.x1 + self.x2) / 2, (self.y1 + self.y2) / 2)))
+        self.max_half_length = float(np.hypot(self.x2 - self.x1, self.y2 - self.y1).max()) / 2
+
+    def project(self, indices: np.ndarray, x: float, y: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Расстояния от точки до отрезков и положение проекций на них (0..1)."""
+        dx = self.x2[indices] - self.x1[indices]
+        dy = self.y2[indices] - self.y1[indices]
+        length_sq = dx * dx + dy * dy
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fractions = ((x - self.x1[indices]) * dx + (y - self.y1[indices]) * dy) / length_sq
+        fractions = np.clip(np.nan_to_num(fractions), 0.0, 1.0)
+        distances = np.hypot(self.x1[indices] + fractions * dx - x, self.y1[indices] + fractions * dy - y)
+        return distances, fractions
+
+    def candidates(self, x: float, y: float) -> np.ndarray:
+        """Номера отрезков, среди которых точно есть ближайший, по возрастанию."""
+        if len(self.all_indices) <= LINEAR_SCAN_LIMIT:
+            return self.all_indices
+        _, closest = self.tree.query((x, y))
+        bound, _ = self.project(np.array([closest]), x, y)
+        return np.array(sorted(self.tree.query_ball_point((x, y), bound[0] + self.max_half_length)), dtype=np.intp)
+
+    def nearest(self, x: float, y: float) -> SegmentSnap:
+        indices = self.candidates(x, y)
+        distances, fractions = self.project(indices, x, y)
+        # При равных расстояниях — первая линия в порядке SVG
+        best = int(np.argmin(distances))
+        i, fraction = int(indices[best]), float(fractions[best])
+        return SegmentSnap(
+            self.line_ids[i],
+            self.starts[i],
+            self.ends[i],
+            fraction,
+            float(distances[best]),
+            float(self.x1[i] + fraction * (self.x2[i] - self.x1[i])),
+            float(self.y1[i] + fraction * (self.y2[i] - self.y1[i])),
+        )
+
+
+class SegmentIndex:
+    """Поэтажный индекс разрешённых линий (AllowedLines) для привязки координат пользователя к графу."""
+
+    def __init__(self, segments_by_floor: Dict[str, List[Tuple[str, str, str, float, float, float, float]]]):
+        self.floors: Dict[str, FloorSegments] = {
+            floor: FloorSegments(segments) for floor, segments in segments_by_floor.items() if segments
+        }
+
+    def nearest(self, floor: str, x: float, y: float) -> Optional[SegmentSnap]:
+        """Ближайшая к точке линия этажа с проекцией точки на неё; None, если линий на этаже нет."""
+        floor_segments = self.floors.get(floor_key(floor))
+        return floor_segments.nearest(x, y) if floor_segments else None
+
+
+def build_segment_index(root: ET.Element, edges: List[dict], floors: List[str]) -> SegmentIndex:
+    """
+    Строит индекс по линиям групп '<этаж>_AllowedLines' SVG.
+
+    Координаты линий есть только в SVG, а узлы — в рёбрах плана: конвертер записывает ребро
+    от узла у (x1, y1) к узлу у (x2, y2), поэтому 'from' и 'to' задают концы линии.
+    Линии, не ставшие рёбрами графа, пропускаются.
+    """
+    ends_by_line = {edge['line_id']: (edge['from'], edge['to']) for edge in edges if edge.get('line_id')}
+    segments_by_floor = {}
+    for floor in floors:
+        group = root.find(f".//svg:g[@id='{floor}_AllowedLines']", namespaces=SVG_NS)
+        segments = []
+        if group is not None:
+            for line in group.findall('svg:line', namespaces=SVG_NS):
+                ends = ends_by_line.get(line.get('id'))
+                if ends is None:
+                    continue
+                coords = tuple(float(line.get(name, '0')) for name in ('x1', 'y1', 'x2', 'y2'))
+                segments.append((line.get('id'), *ends, *coords))
+        segments_by_floor[floor_key(floor)] = segments
+    return SegmentIndex(segments_by_floor)
@@ -0,0 +1,158 @@
+import copy
+import math
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Используется, если для этажа нет данных о размерах
+DEFAULT_MAX_DISTANCE = 100.0
+
+
+def floor_key(floor: str) -> str:
+    """Приводит 'Floor_Second' и 'Second' к единому ключу 'second'."""
+    floor = floor.lower()
+    return floor[len("floor_"):] if floor.startswith("floor_") else floor
+
+
+def center(position: dict) -> Tuple[float, float]:
+    return position["x"] + position.get("width", 0) / 2, position["y"] + position.get("height", 0) / 2
+
+
+class FloorIndex:
+    """
+    KD-дерево по центрам объектов и их дверей на одном этаже.
+    Каждая точка ссылается на индекс объекта в исходном списке.
+    """
+
+    def __init__(
+        self,
+        points: List[Tuple[float, float]],
+        owners: List[int],
+        door_ids: List[Optional[str]],
+        extent: Tuple[float, float, float, float],
+    ):
+        from scipy.spatial import cKDTree
+
+        self.points = np.asarray(points, dtype=float)
+        self.owners = np.asarray(owners, dtype=np.intp)
+        self.tree = cKDTree(self.points)
+        # Отдельное дерево только по дверям — для привязки пользователя к графу маршрутов
+        door_points = [i for i, door_id in enumerate(door_ids) if door_id is not None]
+        self.door_ids = [door_ids[i] for i in door_points]
+        self.door_tree = cKDTree(self.points[door_points]) if door_points else None
+        min_x, min_y, max_x, max_y = extent
+        # Диагональ этажа — максимально возможное расстояние между двумя точками на нём
+        self.max_distance = math.hypot(max_x - min_x, max_y - min_y) or DEFAULT_MAX_DISTANCE
+
+    def within(self, x: float, y: float, radius: float) -> Dict[int, float]:
+        """Возвращает {индекс объекта: расстояние до ближайшей его точки} в радиусе."""
+        nearest: Dict[int, float] = {}
+        point_indices = self.tree.query_ball_point((x, y), radius)
+        if not point_indices:
+            return nearest
+        distances = np.hypot(self.points[point_indices, 0] - x, self.points[point_indices, 1] - y)
+        for owner, distance in zip(self.owners[point_indices].tolist(), distances.tolist()):
+            if distance < nearest.get(owner, math.inf):
+                nearest[owner] = distance
+        return nearest
+
+    def remapped(self, remap: np.ndarray) -> "FloorIndex":
+        """Копия индекса с пересчитанными номерами объектов (деревья не перестраиваются)."""
+        floor_index = copy.copy(self)
+        floor_index.owners = remap[self.owners]
+        return floor_index
+
+    def nearest_door(self, x: float, y: float) -> Optional[Tuple[str, float]]:
+        if self.door_tree is None:
+            return None
+        distance, index = self.door_tree.query((x, y))
+        return self.door_ids[index], float(distance)
+
+
+def build_floor_indexes(objects: List[dict], only: Optional[Set[str]] = None) -> Dict[str, FloorIndex]:
+    """Строит индексы этажей по объектам; only ограничивает набор этажей."""
+    points_by_floor: Dict[str, List[Tuple[float, float]]] = {}
+    owners_by_floor: Dict[str, List[int]] = {}
+    door_ids_by_floor: Dict[str, List[Optional[str]]] = {}
+    extents: Dict[str, List[float]] = {}
+    for index, obj in enumerate(objects):
+        floor = floor_key(obj["parsed_id"]["floor"])
+        if only is not None and floor not in only:
+            continue
+        positions = [(None, obj["position"])] + [(door["id"], door["position"]) for door in obj.get("doors", [])]
+        extent = extents.setdefault(floor, [math.inf, math.inf, -math.inf, -math.inf])
+        for door_id, position in positions:
+            points_by_floor.setdefault(floor, []).append(center(position))
+            owners_by_floor.setdefault(floor, []).append(index)
+            door_ids_by_floor.setdefault(floor, []).append(door_id)
+            extent[0] = min(extent[0], position["x"])
+            extent[1] = min(extent[1], position["y"])
+            extent[2] = max(extent[2], position["x"] + position.get("width", 0))
+            extent[3] = max(extent[3], position["y"] + position.get("height", 0))
+
+    return {
+        floor: FloorIndex(points, owners_by_floor[floor], door_ids_by_floor[floor], tuple(extents[floor]))
+        for floor, points in points_by_floor.items()
+    }
+
+
+class SpatialIndex:
+    """
+    Поэтажный пространственный индекс объектов плана для поиска «рядом со мной»
+    и нормализации расстояний по реальным размерам этажа.
+
+    Индекс не изменяется после построения: при перезагрузке плана строится новый (см. updated),
+    и номера объектов в нём всегда указывают в его собственный список objects.
+    """
+
+    def __init__(self, objects: List[dict], floors: Optional[Dict[str, FloorIndex]] = None):
+        self.objects = objects
+        self.floors: Dict[str, FloorIndex] = floors if floors is not None else build_floor_indexes(objects)
+
+    def updated(self, objects: List[dict], changed_floors: List[str]) -> "SpatialIndex":
+        """
+        Индекс для нового списка объектов после регенерации плана.
+        Деревья перестраиваются только для изменённых этажей, у остальных пересчитываются индексы объектов.
+        """
+        changed = {floor_key(floor) for floor in changed_floors}
+        new_positions = {obj["id"]: index for index, obj in enumerate(objects)}
+        remap = np.array([new_positions.get(obj["id"], -1) for obj in self.objects], dtype=np.intp)
+
+        floors = build_floor_indexes(objects, changed)
+        for floor, floor_index in self.floors.items():
+            if floor not in changed:
+                floors[floor] = floor_index.remapped(remap)
+        return SpatialIndex(objects, floors)
+
+    def max_distance(self, floor: str) -> float:
+        floor_index = self.floors.get(floor_key(floor))
+        return floor_index.max_distance if floor_index else DEFAULT_MAX_DISTANCE
+
+    def within(self, floor: str, x: float, y: float, radius: float) -> Dict[int, float]:
+        floor_index = self.floors.get(floor_key(floor))
+        return floor_index.within(x, y, radius) if floor_index else {}
+
+    def nearest_door(self, floor: str, x: float, y: float) -> Optional[Tuple[str, float]]:
+        """Ближайшая к точке дверь этажа и расстояние до неё."""
+        floor_index = self.floors.get(floor_key(floor))
+        return floor_index.nearest_door(x, y) if floor_index else None
+
+    def nearby(self, floor: str, x: float, y: float, radius: float, limit: Optional[int] = None) -> List[dict]:
+        """
+        Возвращает объекты этажа в радиусе от точки, отсортированные по расстоянию.
+        """
+        nearest = sorted(self.within(floor, x, y, radius).items(), key=lambda item: item[1])[:limit]
+        results = []
+        for index, distance in nearest:
+            obj = self.objects[index]
+            results.append(
+                {
+                    "id": obj["id"],
+                    "distance": distance,
+                    "floor": obj["parsed_id"]["floor"],
+                    "type": obj["parsed_id"]["type"],
+                    "detail": obj["parsed_id"]["detail"],
+                    "position": obj["position"],
+                }
+            )
+        return results
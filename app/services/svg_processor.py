@@ -1,5 +1,15 @@
 import xml.etree.ElementTree as ET
-from typing import List
+from typing import List, Optional
+
+# Словарь специальных помещений и их меток
+SPECIAL_ROOMS = {
+    "Toilet": "Туалет",
+    "Gym": "Спортзал",
+    "Kitchen": "Кухня",
+    "Wardrobe": "Гардероб",
+    "Dining": "Столовая",
+    "Server": "Серверная",
+}
 
 
 def process_floor_svg(svg_tree: ET.ElementTree, floor: str, all_floors: List[str]) -> ET.ElementTree:
@@ -111,6 +121,25 @@ def process_route_svg(
     return svg_tree
 
 
+def room_label(office_id: str) -> Optional[str]:
+    """Подпись помещения на плане; None для служебных (IDK) и нераспознанных ID."""
+    if not office_id or 'IDK' in office_id:
+        return None
+
+    # Get office details from ID
+    parts = office_id.split('_')
+    if len(parts) < 4:
+        return None
+
+    # Get the room label based on special cases
+    for room_type, label in SPECIAL_ROOMS.items():
+        if room_type in office_id:
+            return label
+
+    # If no special room type found, use the original ID
+    return parts[3]
+
+
 def add_room_labels(tree: ET.ElementTree):
     """
     Adds text labels to rooms in the SVG.
@@ -118,16 +147,6 @@ def add_room_labels(tree: ET.ElementTree):
     root = tree.getroot()
     ns = {'svg': 'http://www.w3.org/2000/svg'}
 
-    # Словарь специальных помещений и их меток
-    special_rooms = {
-        "Toilet": "Туалет",
-        "Gym": "Спортзал",
-        "Kitchen": "Кухня",
-        "Wardrobe": "Гардероб",
-        "Dining": "Столовая",
-        "Server": "Серверная",
-    }
-
     # Process each floor
     for floor in ['Floor_First', 'Floor_Second', 'Floor_Third', 'Floor_Fourth']:
         # Find offices group
@@ -144,24 +163,9 @@ def add_room_labels(tree: ET.ElementTree):
         # Process each office rectangle
         for office in offices_group.findall('svg:rect', namespaces=ns):
             office_id = office.get('id', '')
-            if not office_id or 'IDK' in office_id:
-                continue
-
-            # Get office details from ID
-            parts = office_id.split('_')
-            if len(parts) < 4:
-                continue
-
-            # Get the room label based on special cases
-            label = None
-            for room_type, room_label in special_rooms.items():
-                if room_type in office_id:
-                    label = room_label
-                    break
-
-            # If no special room type found, use the original ID
+            label = room_label(office_id)
             if label is None:
-                label = parts[3]
+                continue
 
             # Calculate text position (center of rectangle)
             try:
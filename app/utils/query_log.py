@@ -0,0 +1,142 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Iterable, Iterator, Optional
+
+from app.core.metrics import QUERY_LOG_DROPPED
+
+
+class QueryLog:
+    """
+    Структурированный лог запросов (JSONL): поисковые запросы, пары маршрутов, задержка.
+
+    Записи складываются в ограниченную deque (append атомарен, блокировок на пути запроса нет).
+    Когда буфер заполнен, новые записи отбрасываются, а не ждут диск. Фоновый поток пачками
+    сериализует записи, дописывает их в файл и ротирует его по размеру.
+
+    В файл пишут все воркеры. Проверка размера, ротация и дозапись пачки выполняются под
+    блокировкой файла '<path>.lock', а пачка уходит одним write в дескриптор с O_APPEND,
+    поэтому строки воркеров не перемешиваются и не попадают в уже ротированный файл.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        capacity: int = 10000,
+        flush_interval: float = 1.0,
+        max_bytes: int = 50 * 2**20,
+        backups: int = 5,
+    ):
+        self.path = path
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.records: deque = deque()
+        self._thread: Optional[threading.Thread] = None
+
+    def log(self, kind: str, **fields):
+        if self.path is None:
+            return
+        if len(self.records) >= self.capacity:
+            QUERY_LOG_DROPPED.inc()
+            return
+        self.records.append((time.time(), kind, fields))
+
+    def flush(self):
+        """Дописывает накопленные записи одной пачкой."""
+        lines = []
+        while True:
+            try:
+                timestamp, kind, fields = self.records.popleft()
+            except IndexError:
+                break
+            lines.append(json.dumps({"ts": round(timestamp, 3), "kind": kind, **fields}, ensure_ascii=False) + "\n")
+        if not lines:
+            return
+        data = "".join(lines).encode("utf-8")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.rotate()
+                self.append(data)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def append(self, data: bytes):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+
+    def rotate(self):
+        """
+        Переименовывает queries.jsonl -> queries.jsonl.1 -> ... когда файл превышает max_bytes.
+        Вызывается под блокировкой лога (см. flush).
+        """
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except FileNotFoundError:
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def start(self):
+        """Запускает фоновую запись. Вызывается в каждом воркере после fork."""
+        if self._thread is not None or self.path is None:
+            return self
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Ошибка при записи лога запросов: {str(e)}")
+
+
+def log_files(path: str) -> list[str]:
+    """Файлы лога от старых к новым: queries.jsonl.N, ..., queries.jsonl.1, queries.jsonl."""
+    rotated = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        rotated.append(f"{path}.{i}")
+        i += 1
+    files = list(reversed(rotated))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_query_log(path: str, kinds: Optional[Iterable[str]] = None) -> Iterator[dict]:
+    """Читает записи лога вместе с ротированными файлами в порядке записи, пропуская повреждённые строки."""
+    kinds = set(kinds) if kinds is not None else None
+    for file_path in log_files(path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                if kinds is None or record.get("kind") in kinds:
+                    yield record
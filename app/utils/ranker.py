@@ -1,15 +1,141 @@
+import atexit
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.repositories.popularity_repository import PopularityRepository
+
+
+class Ranking(NamedTuple):
+    """Номера объектов и массив оценок по этим номерам."""
+
+    index: Dict[str, int]
+    scores: np.ndarray
+
+
 class PopularityRanker:
-    def __init__(self):
-        self.view_counts = {}
-        self.click_counts = {}
+    """
+    Популярность объектов по просмотрам и кликам с экспоненциальным затуханием.
+
+    События складываются в deque (append атомарен, блокировок на пути запроса нет),
+    фоновый поток пачками сбрасывает их в SQLite и перечитывает общие для всех
+    воркеров счётчики. Готовые оценки хранятся в массиве по индексу объекта; номера объектов
+    и оценки публикуются вместе одним присваиванием ranking.
+    """
+
+    def __init__(
+        self,
+        object_ids: List[str],
+        repository: Optional[PopularityRepository] = None,
+        half_life_hours: float = 168.0,
+        flush_interval: float = 5.0,
+    ):
+        self.repository = repository
+        self.decay_rate = math.log(2) / (half_life_hours * 3600)
+        self.flush_interval = flush_interval
+        self.events: deque = deque()
+        self.ranking = Ranking({object_id: i for i, object_id in enumerate(object_ids)}, np.zeros(len(object_ids)))
+        # refresh вызывают фоновый поток и перезагрузка плана: старый список объектов не должен вернуться
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.refresh()
+
+    @property
+    def index(self) -> Dict[str, int]:
+        return self.ranking.index
+
+    @property
+    def scores(self) -> np.ndarray:
+        return self.ranking.scores
 
     def update_stats(self, object_id, viewed=False, clicked=False):
+        now = time.time()
         if viewed:
-            self.view_counts[object_id] = self.view_counts.get(object_id, 0) + 1
+            self.events.append((object_id, 1, 0, now))
         if clicked:
-            self.click_counts[object_id] = self.click_counts.get(object_id, 0) + 1
+            self.events.append((object_id, 0, 1, now))
 
     def get_popularity_score(self, object_id):
-        views = self.view_counts.get(object_id, 0)
-        clicks = self.click_counts.get(object_id, 0)
-        return (clicks * 2 + views) / (views + 1 if views > 0 else 1)
+        ranking = self.ranking
+        index = ranking.index.get(object_id)
+        return float(ranking.scores[index]) if index is not None else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        ranking = self.ranking
+        return {object_id: float(ranking.scores[i]) for object_id, i in ranking.index.items()}
+
+    def set_objects(self, object_ids: List[str]):
+        """Переходит на новый список объектов после перезагрузки плана и пересчитывает оценки."""
+        self.refresh({object_id: i for i, object_id in enumerate(object_ids)})
+
+    def flush(self):
+        """
+        Сбрасывает накопленные события одной пачкой в хранилище. Если запись не удалась,
+        события возвращаются в очередь и уйдут со следующей пачкой.
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.events.popleft())
+            except IndexError:
+                break
+        if self.repository is None or not events:
+            return
+
+        now = time.time()
+        increments: Dict[str, List[float]] = {}
+        for object_id, views, clicks, timestamp in events:
+            # Приводим событие к моменту сброса: хранилище доводит до него и сохранённые счётчики
+            weight = math.exp(-self.decay_rate * max(now - timestamp, 0.0))
+            counts = increments.setdefault(object_id, [0.0, 0.0])
+            counts[0] += views * weight
+            counts[1] += clicks * weight
+        try:
+            self.repository.add_counts({k: (v[0], v[1]) for k, v in increments.items()}, now, self.decay_rate)
+        except Exception:
+            self.events.extendleft(reversed(events))
+            raise
+
+    def refresh(self, index: Optional[Dict[str, int]] = None):
+        """Перечитывает счётчики всех воркеров и пересчитывает массив оценок (для нового index, если задан)."""
+        # Подмена ссылки атомарна: читатели видят либо старые, либо новые номера и оценки
+        with self._refresh_lock:
+            index = index if index is not None else self.ranking.index
+            self.ranking = Ranking(index, self.compute_scores(index))
+
+    def compute_scores(self, index: Dict[str, int]) -> np.ndarray:
+        scores = np.zeros(len(index))
+        if self.repository is None:
+            return scores
+        now = time.time()
+        for object_id, (views, clicks, last_updated) in self.repository.get_all_counts().items():
+            object_index = index.get(object_id)
+            if object_index is None:
+                continue
+            decay = math.exp(-self.decay_rate * max(now - last_updated, 0.0))
+            views *= decay
+            clicks *= decay
+            scores[object_index] = (clicks * 2 + views) / (views + 1)
+        return scores
+
+    def start(self):
+        """Запускает фоновый сброс счётчиков. Вызывается в каждом воркере после fork."""
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                self.refresh()
+            except Exception as e:
+                print(f"Ошибка при сохранении популярности: {str(e)}")
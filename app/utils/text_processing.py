@@ -1,25 +1,104 @@
 import json
 import math
+import os
 import re
 from datetime import datetime
+from functools import lru_cache
 
-import nltk
-from nltk.stem.snowball import SnowballStemmer
-from nltk.tokenize import word_tokenize
-from rapidfuzz.fuzz import partial_ratio
-from symspellpy import SymSpell
-from transliterate import translit
+import numpy as np
 
+from app.core.config import settings
 
-nltk.download('punkt')
-nltk.download('punkt_tab')
-stemmer = SnowballStemmer("russian")
+# Токенизатор без внешних ресурсов: после удаления пунктуации punkt не нужен
+TOKEN_PATTERN = re.compile(r'\w+')
 
 
+@lru_cache(maxsize=1)
+def get_stemmer():
+    """
+    Лениво создаёт стеммер: импорт nltk занимает почти секунду,
+    поэтому он откладывается до первого запроса.
+    """
+    from nltk.stem.snowball import SnowballStemmer
+
+    return SnowballStemmer("russian")
+
+
+MAX_EDIT_DISTANCE = 2
+
+
+def _load_sym_spell(pickle_path: str, dictionary_path: str):
+    from symspellpy import SymSpell
+
+    sym_spell = SymSpell(max_dictionary_edit_distance=MAX_EDIT_DISTANCE)
+    if pickle_path and os.path.exists(pickle_path):
+        sym_spell.load_pickle(pickle_path)
+        return sym_spell
+    if os.path.exists(dictionary_path):
+        sym_spell.load_dictionary(dictionary_path, term_index=0, count_index=1)
+        return sym_spell
+
+    print(f"Словарь SymSpell не найден: '{dictionary_path}'.")
+    return None
+
+
+@lru_cache(maxsize=1)
+def get_sym_spell():
+    """
+    Лениво загружает доменный словарь SymSpell, собранный из словаря здания
+    (см. scripts/cli_build_dictionary.py). Возвращает None, если файл не найден.
+    """
+    return _load_sym_spell("", settings.symspell_domain_dictionary_path)
+
+
+@lru_cache(maxsize=1)
+def get_general_sym_spell():
+    """
+    Лениво загружает общий русский словарь частот. Сначала пробует предкомпилированный pickle
+    (см. scripts/cli_build_symspell.py), затем текстовый словарь.
+    Используется только как запасной вариант, если он включён в настройках.
+    """
+    if not settings.symspell_general_fallback:
+        return None
+    return _load_sym_spell(settings.symspell_pickle_path, settings.symspell_dictionary_path)
+
 
-# Настройка SymSpell
-sym_spell = SymSpell(max_dictionary_edit_distance=2)
-sym_spell.load_dictionary("frequency_dictionary_ru.txt", term_index=0, count_index=1)
+@lru_cache(maxsize=65536)
+def stem(token: str) -> str:
+    """Стемминг с кэшем: одинаковые слова в разных запросах обрабатываются один раз."""
+    return get_stemmer().stem(token)
+
+
+def warmup():
+    """Заранее создаёт тяжёлые компоненты, чтобы первый запрос не платил за их загрузку."""
+    get_stemmer()
+    get_sym_spell()
+    get_general_sym_spell()
+
+
+# Нормализация расстояния, если размеры этажа неизвестны
+MAX_DISTANCE = 100.0
+
+# Раскладки клавиатуры: символы на одних и тех же клавишах QWERTY и ЙЦУКЕН
+QWERTY_KEYS = "`qwertyuiop[]asdfghjkl;'zxcvbnm,.~QWERTYUIOP{}ASDFGHJKL:\"ZXCVBNM<>"
+JCUKEN_KEYS = "ёйцукенгшщзхъфывапролджэячсмитьбюЁЙЦУКЕНГШЩЗХЪФЫВАПРОЛДЖЭЯЧСМИТЬБЮ"
+EN_TO_RU_LAYOUT = str.maketrans(QWERTY_KEYS, JCUKEN_KEYS)
+RU_TO_EN_LAYOUT = str.maketrans(JCUKEN_KEYS, QWERTY_KEYS)
+
+# Транслитерация кириллицы в латиницу, совпадает с transliterate.translit(text, 'ru', reversed=True)
+CYRILLIC_LETTERS = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+LATIN_TRANSLIT = "a b v g d e e zh z i j k l m n o p r s t u f h ts ch sh sch ' y ' e ju ja".split()
+RU_TO_LATIN = dict(zip(CYRILLIC_LETTERS, LATIN_TRANSLIT))
+RU_TO_LATIN_TABLE = str.maketrans(
+    {**RU_TO_LATIN, **{char.upper(): value.capitalize() for char, value in RU_TO_LATIN.items()}}
+)
+
+# Веса факторов общей релевантности
+RELEVANCE_WEIGHTS = {"text": 0.5, "time": 0.3, "location": 0.2}
+
+# Разрешение таблицы актуальности по времени: 15-минутные интервалы
+TIME_BUCKETS_PER_HOUR = 4
+TIME_BUCKETS = 24 * TIME_BUCKETS_PER_HOUR
 
 # Словарь цифр для обработки чисел
 NUMBERS = {
@@ -46,13 +125,80 @@ def normalize_text(text: str) -> str:
 
 # Обработка транслита
 def handle_translit(text: str) -> str:
-    return translit(text, 'ru', reversed=True)
+    return text.translate(RU_TO_LATIN_TABLE)
+
+
+def is_cyrillic(char: str) -> bool:
+    return 'а' <= char.lower() <= 'я' or char in 'ёЁ'
+
+
+def layout_variants(text: str) -> list[str]:
+    """
+    Возвращает запрос и его вариант в другой раскладке, если он целиком набран
+    латиницей или кириллицей (например, 'rf,bytn' -> 'кабинет', 'ещшдуе' -> 'toilet').
+    """
+    letters = [char for char in text if char.isalpha()]
+    if not letters:
+        return [text]
+    if all(is_cyrillic(char) for char in letters):
+        return [text, text.translate(RU_TO_EN_LAYOUT)]
+    if all(char.isascii() for char in letters):
+        return [text, text.translate(EN_TO_RU_LAYOUT)]
+    return [text]
+
+
+def is_known_phrase(text: str) -> bool:
+    """Проверяет, что все слова без цифр есть в доменном словаре."""
+    sym_spell = get_sym_spell()
+    if sym_spell is None:
+        return False
+    words = [word for word in text.split() if not any(char.isdigit() for char in word)]
+    return bool(words) and all(word in sym_spell.words for word in words)
+
+
+# Слова не длиннее этого не исправляются, до SINGLE_EDIT_MAX_LENGTH допускается одна правка
+NO_CORRECTION_MAX_LENGTH = 4
+SINGLE_EDIT_MAX_LENGTH = 6
+
+
+def allowed_edit_distance(token: str) -> int:
+    """
+    Допустимое число правок для слова. Короткие слова не исправляются: после транслита
+    почти любое из них в одной-двух правках от термина словаря ('lift' -> 'left').
+    """
+    if len(token) <= NO_CORRECTION_MAX_LENGTH:
+        return 0
+    if len(token) <= SINGLE_EDIT_MAX_LENGTH:
+        return 1
+    return MAX_EDIT_DISTANCE
+
+
+def correct_token(token: str) -> str:
+    """
+    Исправляет одно слово: сначала по доменному словарю, затем, если он не нашёл близкого термина
+    и общий словарь включён, — по общему. Слово без близких терминов остаётся как есть.
+    """
+    from symspellpy import Verbosity
+
+    max_edit_distance = allowed_edit_distance(token)
+    if max_edit_distance == 0 or any(char.isdigit() for char in token):
+        return token
+    for sym_spell in (get_sym_spell(), get_general_sym_spell()):
+        if sym_spell is None:
+            continue
+        suggestions = sym_spell.lookup(token, Verbosity.TOP, max_edit_distance=max_edit_distance)
+        if suggestions:
+            return suggestions[0].term
+    return token
 
 
 # Обработка опечаток с SymSpell
 def handle_typos(query: str) -> str:
-    suggestions = sym_spell.lookup_compound(query, max_edit_distance=2)
-    return suggestions[0].term if suggestions else query
+    """
+    Исправляет опечатки по словам. Номера кабинетов, идентификаторы с цифрами и короткие
+    слова не исправляются; допустимое число правок растёт с длиной слова.
+    """
+    return ' '.join(correct_token(token) for token in query.split())
 
 
 # Лемматизация и очистка текста
@@ -73,10 +219,10 @@ def advanced_normalize_text_with_stemming(text: str) -> str:
     text = re.sub(r'[^\w\s]', '', text)
 
     # Токенизация текста
-    tokens = word_tokenize(text)
+    tokens = TOKEN_PATTERN.findall(text)
 
     # Стемминг
-    stemmed_tokens = [stemmer.stem(token) for token in tokens]
+    stemmed_tokens = [stem(token) for token in tokens]
 
     # Удаление стоп-слов
     stop_words = set(['и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как'])
@@ -86,22 +232,41 @@ def advanced_normalize_text_with_stemming(text: str) -> str:
     return ' '.join(filtered_tokens)
 
 
+@lru_cache(maxsize=None)
 def load_synonyms(file_path: str) -> dict:
     with open(file_path, "r", encoding="utf-8") as f:
         synonyms = json.load(f)
 
-    # Создаём обратный словарь
+    # Создаём обратный словарь. Синонимы приводятся к тому же виду, что и запрос
+    # (транслит и стемминг), иначе кириллические синонимы никогда не совпадут.
     reverse_synonyms = {}
     for key, values in synonyms.items():
         for value in values:
             reverse_synonyms[value] = key  # Привязываем синоним к ключу
+            normalized = advanced_normalize_text_with_stemming(handle_translit(value))
+            if normalized:
+                reverse_synonyms.setdefault(normalized, key)
     return reverse_synonyms
 
 
+@lru_cache(maxsize=None)
+def load_synonym_phrases(file_path: str):
+    """Регулярное выражение для синонимов из нескольких слов, длинные фразы проверяются первыми."""
+    phrases = sorted((value for value in load_synonyms(file_path) if ' ' in value), key=len, reverse=True)
+    if not phrases:
+        return None
+    return re.compile(r'\b(' + '|'.join(re.escape(phrase) for phrase in phrases) + r')\b')
+
+
 def expand_synonyms(text: str, synonyms_file: str) -> str:
     # Загружаем обратный словарь
     reverse_synonyms = load_synonyms(synonyms_file)
 
+    # Сначала заменяем фразы из нескольких слов
+    phrases = load_synonym_phrases(synonyms_file)
+    if phrases is not None:
+        text = phrases.sub(lambda match: reverse_synonyms[match.group(0)], text)
+
     # Разбиваем текст на токены
     tokens = text.split()
 
@@ -112,53 +277,84 @@ def expand_synonyms(text: str, synonyms_file: str) -> str:
     return ' '.join(expanded_tokens)
 
 
-# Нечеткий поиск
-def fuzzy_match(query: str, target: str) -> bool:
-    return partial_ratio(query, target) > 80 or query in target
+def time_bucket(user_time: datetime) -> int:
+    """Номер 15-минутного интервала суток для строки таблицы актуальности."""
+    return user_time.hour * TIME_BUCKETS_PER_HOUR + user_time.minute * TIME_BUCKETS_PER_HOUR // 60
+
+
+def parse_working_hours(obj: dict):
+    """Возвращает (open, close) в часах или None, если часы работы не заданы или некорректны."""
+    working_hours = obj.get("working_hours")
+    if not working_hours:
+        return None
+    try:
+        open_h, _, open_m = working_hours["open"].partition(":")
+        close_h, _, close_m = working_hours["close"].partition(":")
+        return int(open_h) + int(open_m or 0) / 60, int(close_h) + int(close_m or 0) / 60
+    except (KeyError, ValueError, AttributeError):
+        return None
+
+
+def time_relevance(open_hour: float, close_hour: float, current_hour: float) -> float:
+    if open_hour <= current_hour < close_hour:
+        middle_hour = (open_hour + close_hour) / 2
+        time_diff = abs(current_hour - middle_hour)
+        max_diff = (close_hour - open_hour) / 2
+        return 1 - (time_diff / max_diff) * 0.5
+    else:
+        hours_until_open = (open_hour - current_hour) % 24
+        return max(0.1, 0.5 - (hours_until_open / 24))
 
 
 def get_time_relevance(obj: dict, user_time: datetime) -> float:
-    if "working_hours" not in obj:
+    hours = parse_working_hours(obj)
+    if hours is None:
         return 1.0
+    return time_relevance(hours[0], hours[1], time_bucket(user_time) / TIME_BUCKETS_PER_HOUR)
 
-    current_hour = user_time.hour
-    try:
-        open_hour = int(obj["working_hours"]["open"].split(":")[0])
-        close_hour = int(obj["working_hours"]["close"].split(":")[0])
-
-        if open_hour <= current_hour < close_hour:
-            middle_hour = (open_hour + close_hour) / 2
-            time_diff = abs(current_hour - middle_hour)
-            max_diff = (close_hour - open_hour) / 2
-            return 1 - (time_diff / max_diff) * 0.5
-        else:
-            hours_until_open = (open_hour - current_hour) % 24
-            return max(0.1, 0.5 - (hours_until_open / 24))
-    except (KeyError, ValueError):
-        return 1.0
+
+def build_time_relevance_table(objects: list[dict]) -> np.ndarray:
+    """
+    Предвычисляет актуальность по времени для всех объектов: строка — 15-минутный интервал суток,
+    столбец — индекс объекта. На запросе остаётся только table[time_bucket(user_time)].
+    """
+    table = np.ones((TIME_BUCKETS, len(objects)))
+    for index, obj in enumerate(objects):
+        hours = parse_working_hours(obj)
+        if hours is None:
+            continue
+        for bucket in range(TIME_BUCKETS):
+            table[bucket, index] = time_relevance(hours[0], hours[1], bucket / TIME_BUCKETS_PER_HOUR)
+    return table
 
 
 # Расчет расстояния
-def calculate_distance(location1: dict, location2: dict) -> float:
-    try:
-        dx = location1["x"] - location2["x"]
-        dy = location1["y"] - location2["y"]
-        distance = math.sqrt(dx**2 + dy**2)
-        MAX_DISTANCE = 100.0
-        relevance = 1 - min(distance / MAX_DISTANCE, 1)
-        return max(0.1, relevance)
-    except (KeyError, TypeError):
-        return 0.5
+def euclidean_distance(location, position: dict) -> float:
+    """Расстояние от точки пользователя до центра объекта."""
+    dx = location.x - (position["x"] + position.get("width", 0) / 2)
+    dy = location.y - (position["y"] + position.get("height", 0) / 2)
+    return math.sqrt(dx * dx + dy * dy)
 
 
-# Расчет общей релевантности
-def calculate_relevance(query, obj, user_context):
-    text_similarity = partial_ratio(query, obj["parsed_id"]["detail"]) / 100
-    time_relevance = get_time_relevance(obj, user_context.time)
-    location_relevance = calculate_distance(user_context.location, obj["position"])
+def normalize_distance(distance: float, max_distance: float = MAX_DISTANCE) -> float:
+    """Преобразует расстояние в оценку близости от 0.1 (далеко) до 1 (рядом)."""
+    relevance = 1 - min(distance / max_distance, 1)
+    return max(0.1, relevance)
 
-    weights = {"text": 0.5, "time": 0.3, "location": 0.2}
-    relevance_score = (
-        text_similarity * weights["text"] + time_relevance * weights["time"] + location_relevance * weights["location"]
-    )
-    return relevance_score
+
+def calculate_distance(location, position: dict, max_distance: float = MAX_DISTANCE) -> float:
+    """
+    Рассчитывает нормализованное расстояние между пользователем и объектом.
+
+    Параметры:
+    - location: координаты пользователя (Location)
+    - position: позиция объекта {"x", "y", "width", "height"}
+    - max_distance: размер этажа, к которому нормализуется расстояние
+
+    Возвращает:
+    float: нормализованное значение от 0.1 до 1 (где 1 - ближайшее расположение)
+    """
+    try:
+        return normalize_distance(euclidean_distance(location, position), max_distance)
+    except (AttributeError, KeyError, TypeError):
+        return 0.5
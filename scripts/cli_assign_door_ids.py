@@ -1,7 +1,23 @@
 import argparse
+import hashlib
+import math
+import re
+import statistics
 import sys
-import uuid
+import time
 import xml.etree.ElementTree as ET
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+# Подробный вывод по каждому элементу; выключается флагом --quiet
+VERBOSE = True
+# Группы этажа, которые читает и меняет process_floor
+FLOOR_GROUPS = ['Offices', 'Stairs', 'Doors', 'AllowedLines', 'Intersections']
+
+
+def log_detail(message):
+    if VERBOSE:
+        print(message)
 
 
 def parse_id(element_id):
@@ -13,6 +29,26 @@ def parse_id(element_id):
     return {'type': parts[2] if len(parts) > 2 else '', 'number': parts[3] if len(parts) > 3 else ''}
 
 
+def expand_rect(rect, threshold):
+    """Расширяет прямоугольник на ±threshold пикселей со всех сторон."""
+    return {
+        'x': rect['x'] - threshold,
+        'y': rect['y'] - threshold,
+        'width': rect['width'] + 2 * threshold,
+        'height': rect['height'] + 2 * threshold,
+    }
+
+
+def is_overlap(rect1, rect2):
+    """Проверяет пересечение двух прямоугольников, касание границей считается пересечением."""
+    return not (
+        rect1['x'] + rect1['width'] < rect2['x']
+        or rect2['x'] + rect2['width'] < rect1['x']
+        or rect1['y'] + rect1['height'] < rect2['y']
+        or rect2['y'] + rect2['height'] < rect1['y']
+    )
+
+
 def is_overlap_with_threshold(rect1, rect2, threshold=10):
     """
     Проверяет пересечение двух прямоугольников с учетом порога.
@@ -20,20 +56,45 @@ def is_overlap_with_threshold(rect1, rect2, threshold=10):
     rect1 и rect2 должны быть словарями с ключами 'x', 'y', 'width', 'height'.
     Порог расширяет rect2 на ±threshold пикселей со всех сторон.
     """
-    # Расширяем прямоугольник rect2 на порог
-    expanded_rect2 = {
-        'x': rect2['x'] - threshold,
-        'y': rect2['y'] - threshold,
-        'width': rect2['width'] + 2 * threshold,
-        'height': rect2['height'] + 2 * threshold,
-    }
-    # Проверка пересечения
-    return not (
-        rect1['x'] + rect1['width'] < expanded_rect2['x']
-        or expanded_rect2['x'] + expanded_rect2['width'] < rect1['x']
-        or rect1['y'] + rect1['height'] < expanded_rect2['y']
-        or expanded_rect2['y'] + expanded_rect2['height'] < rect1['y']
-    )
+    return is_overlap(rect1, expand_rect(rect2, threshold))
+
+
+class RectIndex:
+    """
+    Пространственный хэш расширенных на порог прямоугольников комнат.
+
+    Каждый прямоугольник записывается во все ячейки сетки, которые он покрывает, дверь проверяется
+    только с прямоугольниками своих ячеек. Из пересекающихся выбирается первый в исходном порядке,
+    как при полном переборе.
+    """
+
+    def __init__(self, objects, threshold):
+        # objects: [(объект, прямоугольник)] в исходном порядке
+        self.rects = [(order, obj, expand_rect(rect, threshold)) for order, (obj, rect) in enumerate(objects)]
+        sizes = [max(rect['width'], rect['height']) for _, _, rect in self.rects]
+        self.cell_size = max(statistics.median(sizes), 1.0) if sizes else 1.0
+        self.cells = defaultdict(list)
+        for item in self.rects:
+            for cell in self.cells_of(item[2]):
+                self.cells[cell].append(item)
+
+    def cell_range(self, start, size):
+        end = start + size
+        return range(math.floor(min(start, end) / self.cell_size), math.floor(max(start, end) / self.cell_size) + 1)
+
+    def cells_of(self, rect):
+        for cx in self.cell_range(rect['x'], rect['width']):
+            for cy in self.cell_range(rect['y'], rect['height']):
+                yield cx, cy
+
+    def first_overlap(self, rect):
+        """Первый в исходном порядке объект, расширенный прямоугольник которого пересекает rect."""
+        candidates = {item[0]: item for cell in self.cells_of(rect) for item in self.cells.get(cell, ())}
+        for order in sorted(candidates):
+            _, obj, expanded = candidates[order]
+            if is_overlap(rect, expanded):
+                return obj
+        return None
 
 
 def remove_namespaces(tree):
@@ -58,6 +119,10 @@ def assign_new_ids_with_threshold(root, doors_group, objects, stairs_group, floo
     # Сбор всех дверей
     doors = doors_group.findall('svg:rect', namespaces={'svg': 'http://www.w3.org/2000/svg'})
 
+    # Индексы строятся один раз на этаж, дверь сравнивается только с соседними комнатами
+    office_index = RectIndex([(office, office['position']) for office in offices], threshold)
+    stair_index = RectIndex([(stair, stair['position']) for stair in stairs if stair.get('position')], threshold)
+
     # Инициализация счетчиков для офисов и лестниц
     office_door_counters = {}
     stair_door_counters = {}
@@ -77,53 +142,55 @@ def assign_new_ids_with_threshold(root, doors_group, objects, stairs_group, floo
         height = float(door.get('height', '0'))
         door_rect = {'x': x, 'y': y, 'width': width, 'height': height}
 
-        # Проверка пересечения с каждым офисом
-        assigned = False
-        for office in offices:
-            office_rect = office['position']
-            if is_overlap_with_threshold(door_rect, office_rect, threshold=threshold):
-                # Извлекаем уникальную часть ID офиса
-                office_number = office['id'].split('_')[-1]
-                # Инициализируем счетчик для этого офиса, если еще не инициализирован
-                if office['id'] not in office_door_counters:
-                    office_door_counters[office['id']] = 1
-                else:
-                    office_door_counters[office['id']] += 1
-                door_suffix = office_door_counters[office['id']]
-                new_id = f"{floor}_Door_Office_{office_number}_{door_suffix}"
-                print(f"Дверь {door_id} пересекается с офисом {office['id']}; присваивается новый ID: {new_id}")
-                door.set('id', new_id)
-                assigned = True
-                break  # Предполагаем, что дверь может быть связана только с одним объектом
-
-        if not assigned:
-            for stair in stairs:
-                stair_rect = stair.get('position', {})
-                if stair_rect and is_overlap_with_threshold(door_rect, stair_rect, threshold=threshold):
-                    stair_number = stair['id'].split('_')[-1]
-                    # Инициализируем счетчик для этой лестницы, если еще не инициализирован
-                    if stair['id'] not in stair_door_counters:
-                        stair_door_counters[stair['id']] = 1
-                    else:
-                        stair_door_counters[stair['id']] += 1
-                    door_suffix = stair_door_counters[stair['id']]
-                    new_id = f"{floor}_Door_Stairs_{stair_number}_{door_suffix}"
-                    print(f"Дверь {door_id} пересекается с лестницей {stair['id']}; присваивается новый ID: {new_id}")
-                    door.set('id', new_id)
-                    assigned = True
-                    break  # Предполагаем, что дверь может быть связана только с одним объектом
-
-        if not assigned:
+        # Дверь связывается с одним объектом: сначала офисы, затем лестницы
+        office = office_index.first_overlap(door_rect)
+        stair = stair_index.first_overlap(door_rect) if office is None else None
+        if office is not None:
+            # Извлекаем уникальную часть ID офиса
+            office_number = office['id'].split('_')[-1]
+            office_door_counters[office['id']] = office_door_counters.get(office['id'], 0) + 1
+            door_suffix = office_door_counters[office['id']]
+            new_id = f"{floor}_Door_Office_{office_number}_{door_suffix}"
+            log_detail(f"Дверь {door_id} пересекается с офисом {office['id']}; присваивается новый ID: {new_id}")
+        elif stair is not None:
+            stair_number = stair['id'].split('_')[-1]
+            stair_door_counters[stair['id']] = stair_door_counters.get(stair['id'], 0) + 1
+            door_suffix = stair_door_counters[stair['id']]
+            new_id = f"{floor}_Door_Stairs_{stair_number}_{door_suffix}"
+            log_detail(f"Дверь {door_id} пересекается с лестницей {stair['id']}; присваивается новый ID: {new_id}")
+        else:
             # Если не пересекается ни с одним офисом или лестницей, присваиваем уникальный ID
             new_id = f"{floor}_Door_Unassigned_{unassigned_door_counter}"
-            print(f"Дверь {door_id} не пересекается с ни одним офисом или лестницей; присваивается новый ID: {new_id}")
-            door.set('id', new_id)
+            log_detail(
+                f"Дверь {door_id} не пересекается с ни одним офисом или лестницей; присваивается новый ID: {new_id}"
+            )
             unassigned_door_counter += 1
+        door.set('id', new_id)
 
 
-def assign_random_ids(root, floor, group_suffix, id_prefix):
+def content_id(elem, floor, id_prefix, used):
+    """
+    ID из хэша содержимого элемента (тег и атрибуты без id): один и тот же элемент всегда получает один ID.
+    При совпадении берётся следующий фрагмент хэша.
     """
-    Присваивает случайные уникальные ID элементам в указанной группе.
+    content = elem.tag + ''.join(f' {k}={v}' for k, v in sorted(elem.attrib.items()) if k != 'id')
+    digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+    for start in range(0, len(digest) - 3):
+        new_id = f"{floor}_{id_prefix}_{digest[start:start + 4]}"
+        if new_id not in used:
+            return new_id
+    suffix = 1
+    while f"{floor}_{id_prefix}_{digest[:4]}{suffix}" in used:
+        suffix += 1
+    return f"{floor}_{id_prefix}_{digest[:4]}{suffix}"
+
+
+def assign_stable_ids(root, floor, group_suffix, id_prefix):
+    """
+    Присваивает уникальные ID элементам в указанной группе.
+
+    Элементы, у которых уже есть корректный уникальный ID, его сохраняют, поэтому повторная генерация
+    не меняет ID неизменившихся линий и пересечений. Новым элементам ID выводится из их содержимого.
 
     :param root: Корневой элемент XML дерева.
     :param floor: Название этажа, например, 'Floor_First'.
@@ -133,15 +200,169 @@ def assign_random_ids(root, floor, group_suffix, id_prefix):
     group_id = f"{floor}_{group_suffix}"
     group = root.find(f'.//svg:g[@id="{group_id}"]', namespaces={'svg': 'http://www.w3.org/2000/svg'})
     if group is not None:
-        for elem in group.findall('svg:*', namespaces={'svg': 'http://www.w3.org/2000/svg'}):
-            new_id = f"{floor}_{id_prefix}_{uuid.uuid4().hex[:4]}"
-            print(f"Присваивается новый ID элементу <{elem.tag}>: {new_id}")
+        valid_id = re.compile(rf'{re.escape(floor)}_{re.escape(id_prefix)}_[0-9a-f]{{4,}}')
+        elements = group.findall('svg:*', namespaces={'svg': 'http://www.w3.org/2000/svg'})
+        used = set()
+        pending = []
+        for elem in elements:
+            elem_id = elem.get('id', '')
+            if valid_id.fullmatch(elem_id) and elem_id not in used:
+                used.add(elem_id)
+            else:
+                pending.append(elem)
+        for elem in pending:
+            new_id = content_id(elem, floor, id_prefix, used)
+            used.add(new_id)
+            log_detail(f"Присваивается новый ID элементу <{elem.tag}>: {new_id}")
             elem.set('id', new_id)
     else:
         print(f"Группа '{group_id}' не найдена в SVG.")
 
 
-def parse_svg(svg_input_file, floors, threshold):
+def process_floor(root, floor, threshold):
+    """
+    Обрабатывает один этаж: собирает офисы и лестницы, назначает ID дверям, линиям и пересечениям.
+    Меняет только группы этого этажа, поэтому этажи можно обрабатывать независимо.
+    """
+    namespaces = {'svg': 'http://www.w3.org/2000/svg'}
+    print(f"\nОбработка этажа: {floor}")
+    objects = {f"{floor}_Offices": [], f"{floor}_Stairs": []}
+
+    # Извлечение информации об офисах
+    offices_group = root.find(f'.//svg:g[@id="{floor}_Offices"]', namespaces)
+    if offices_group is not None:
+        for office in offices_group.findall('svg:rect', namespaces):
+            office_id = office.get('id')
+            if office_id:
+                parsed_id = parse_id(office_id)
+                try:
+                    x = float(office.get('x', '0'))
+                    y = float(office.get('y', '0'))
+                    width = float(office.get('width', '0'))
+                    height = float(office.get('height', '0'))
+                except ValueError:
+                    print(f"Ошибка: Некорректные координаты или размеры для офиса с ID '{office_id}'. Пропуск.")
+                    continue
+                objects[f"{floor}_Offices"].append(
+                    {
+                        'id': office_id,
+                        'parsed_id': parsed_id,
+                        'position': {'x': x, 'y': y, 'width': width, 'height': height},
+                        'doors': [],  # Инициализация списка дверей
+                    }
+                )
+    else:
+        print(f"Группа '{floor}_Offices' не найдена в SVG.")
+
+    # Извлечение информации о лестницах (если необходимо)
+    stairs_group = root.find(f'.//svg:g[@id="{floor}_Stairs"]', namespaces)
+    if stairs_group is not None:
+        for stair in stairs_group.findall('svg:g', namespaces):
+            stair_id = stair.get('id')
+            log_detail(f"Обрабатываем лестницу: {stair_id}")
+            if stair_id:
+                rects = stair.findall('svg:rect', namespaces)
+                if rects:
+                    # Инициализируем границы для всей группы
+                    x_min, y_min = float('inf'), float('inf')
+                    x_max, y_max = float('-inf'), float('-inf')
+
+                    # Обрабатываем каждый прямоугольник в группе
+                    for rect in rects:
+                        try:
+                            x = float(rect.get('x', '0'))
+                            y = float(rect.get('y', '0'))
+                            width = float(rect.get('width', '0'))
+                            height = float(rect.get('height', '0'))
+                        except ValueError:
+                            print(f"Err: Bad coords or sizes for rect in stair '{stair_id}'. Skip.")
+                            continue
+
+                        # Обновляем минимальные и максимальные границы
+                        x_min = min(x_min, x)
+                        y_min = min(y_min, y)
+                        x_max = max(x_max, x + width)
+                        y_max = max(y_max, y + height)
+
+                    if x_min == float('inf') or y_min == float('inf'):
+                        print(f"Предупреждение: Лестница '{stair_id}' не содержит валидных прямоугольников.")
+                        continue
+
+                    # Рассчитываем итоговые размеры группы
+                    stair_position = {
+                        'x': x_min,
+                        'y': y_min,
+                        'width': x_max - x_min,
+                        'height': y_max - y_min,
+                    }
+
+                    # Добавляем данные о лестнице в objects
+                    objects[f"{floor}_Stairs"].append(
+                        {
+                            'id': stair_id,
+                            'parsed_id': parse_id(stair_id),
+                            'position': stair_position,
+                            'doors': [],  # Инициализация списка дверей
+                        }
+                    )
+                    log_detail(f"Лестница {stair_id} границы: {stair_position}")
+    else:
+        print(f"Группа '{floor}_Stairs' не найдена в SVG.")
+
+    # Извлечение информации о дверях
+    doors_group = root.find(f'.//svg:g[@id="{floor}_Doors"]', namespaces)
+    if doors_group is not None:
+        assign_new_ids_with_threshold(
+            root=root,
+            doors_group=doors_group,
+            objects=objects,
+            stairs_group=stairs_group,
+            floor=floor,
+            threshold=threshold,
+        )
+    else:
+        print(f"Группа '{floor}_Doors' не найдена в SVG.")
+
+    # Присваиваем стабильные ID элементам в группах AllowedLines и Intersections
+    assign_stable_ids(root, floor, "AllowedLines", "AllowedLine")
+    assign_stable_ids(root, floor, "Intersections", "Intersection")
+
+    return objects
+
+
+def floor_subtree(root, floor):
+    """Корень только с группами этажа: всё, что читает и меняет process_floor. Передаётся в процесс пула."""
+    subtree = ET.Element(root.tag)
+    for kind in FLOOR_GROUPS:
+        group = root.find(f'.//svg:g[@id="{floor}_{kind}"]', namespaces={'svg': 'http://www.w3.org/2000/svg'})
+        if group is not None:
+            subtree.append(group)
+    return subtree
+
+
+def process_floor_job(subtree, floor, threshold, verbose):
+    """
+    Выполняется в процессе пула: обрабатывает копию групп этажа и возвращает объекты,
+    новые ID дочерних элементов каждой группы и время обработки.
+    """
+    global VERBOSE
+    VERBOSE = verbose
+    started = time.perf_counter()
+    objects = process_floor(subtree, floor, threshold)
+    ids = {group.get('id'): [child.get('id') for child in group] for group in subtree}
+    return objects, ids, time.perf_counter() - started
+
+
+def apply_ids(root, ids):
+    """Переносит ID, назначенные в процессе пула, на элементы исходного дерева (в том же порядке)."""
+    for group_id, child_ids in ids.items():
+        group = root.find(f'.//svg:g[@id="{group_id}"]', namespaces={'svg': 'http://www.w3.org/2000/svg'})
+        for child, child_id in zip(group, child_ids):
+            if child_id is not None:
+                child.set('id', child_id)
+
+
+def parse_svg(svg_input_file, floors, threshold, jobs=1):
     """
     Основная функция для парсинга SVG-файла и обновления ID дверей для нескольких этажей.
     """
@@ -156,117 +377,29 @@ def parse_svg(svg_input_file, floors, threshold):
         print(f"SVG-файл '{svg_input_file}' не найден.")
         sys.exit(1)
 
-    # Пространства имен SVG
-    namespaces = {'svg': 'http://www.w3.org/2000/svg'}
-
     # Структура данных для всех этажей
     objects_all_floors = {}
+    timings = {}
 
-    for floor in floors:
-        print(f"\nОбработка этажа: {floor}")
-        objects = {f"{floor}_Offices": [], f"{floor}_Stairs": []}
-
-        # Извлечение информации об офисах
-        offices_group = root.find(f'.//svg:g[@id="{floor}_Offices"]', namespaces)
-        if offices_group is not None:
-            for office in offices_group.findall('svg:rect', namespaces):
-                office_id = office.get('id')
-                if office_id:
-                    parsed_id = parse_id(office_id)
-                    try:
-                        x = float(office.get('x', '0'))
-                        y = float(office.get('y', '0'))
-                        width = float(office.get('width', '0'))
-                        height = float(office.get('height', '0'))
-                    except ValueError:
-                        print(f"Ошибка: Некорректные координаты или размеры для офиса с ID '{office_id}'. Пропуск.")
-                        continue
-                    objects[f"{floor}_Offices"].append(
-                        {
-                            'id': office_id,
-                            'parsed_id': parsed_id,
-                            'position': {'x': x, 'y': y, 'width': width, 'height': height},
-                            'doors': [],  # Инициализация списка дверей
-                        }
-                    )
-        else:
-            print(f"Группа '{floor}_Offices' не найдена в SVG.")
-
-        # Извлечение информации о лестницах (если необходимо)
-        stairs_group = root.find(f'.//svg:g[@id="{floor}_Stairs"]', namespaces)
-        if stairs_group is not None:
-            for stair in stairs_group.findall('svg:g', namespaces):
-                stair_id = stair.get('id')
-                print(f"Обрабатываем лестницу: {stair_id}")
-                if stair_id:
-                    rects = stair.findall('svg:rect', namespaces)
-                    if rects:
-                        # Инициализируем границы для всей группы
-                        x_min, y_min = float('inf'), float('inf')
-                        x_max, y_max = float('-inf'), float('-inf')
-
-                        # Обрабатываем каждый прямоугольник в группе
-                        for rect in rects:
-                            try:
-                                x = float(rect.get('x', '0'))
-                                y = float(rect.get('y', '0'))
-                                width = float(rect.get('width', '0'))
-                                height = float(rect.get('height', '0'))
-                            except ValueError:
-                                print(f"Err: Bad coords or sizes for rect in stair '{stair_id}'. Skip.")
-                                continue
-
-                            # Обновляем минимальные и максимальные границы
-                            x_min = min(x_min, x)
-                            y_min = min(y_min, y)
-                            x_max = max(x_max, x + width)
-                            y_max = max(y_max, y + height)
-
-                        if x_min == float('inf') or y_min == float('inf'):
-                            print(f"Предупреждение: Лестница '{stair_id}' не содержит валидных прямоугольников.")
-                            continue
-
-                        # Рассчитываем итоговые размеры группы
-                        stair_position = {
-                            'x': x_min,
-                            'y': y_min,
-                            'width': x_max - x_min,
-                            'height': y_max - y_min,
-                        }
-
-                        # Добавляем данные о лестнице в objects
-                        objects[f"{floor}_Stairs"].append(
-                            {
-                                'id': stair_id,
-                                'parsed_id': parse_id(stair_id),
-                                'position': stair_position,
-                                'doors': [],  # Инициализация списка дверей
-                            }
-                        )
-                        print(f"Лестница {stair_id} границы: {stair_position}")
-        else:
-            print(f"Группа '{floor}_Stairs' не найдена в SVG.")
-
-        # Извлечение информации о дверях
-        doors_group = root.find(f'.//svg:g[@id="{floor}_Doors"]', namespaces)
-        if doors_group is not None:
-            assign_new_ids_with_threshold(
-                root=root,
-                doors_group=doors_group,
-                objects=objects,
-                stairs_group=stairs_group,
-                floor=floor,
-                threshold=threshold,
-            )
-        else:
-            print(f"Группа '{floor}_Doors' не найдена в SVG.")
-
-        # Присваиваем случайные ID элементам в группах AllowedLines и Intersections
-        assign_random_ids(root, floor, "AllowedLines", "AllowedLine")
-        assign_random_ids(root, floor, "Intersections", "Intersection")
-
-        # Добавляем объекты текущего этажа в общую структуру
-        objects_all_floors.update(objects)
+    if jobs <= 1 or len(floors) <= 1:
+        for floor in floors:
+            started = time.perf_counter()
+            objects_all_floors.update(process_floor(root, floor, threshold))
+            timings[floor] = time.perf_counter() - started
+    else:
+        # Этажи обрабатываются в пуле над копиями своих групп, результаты применяются в порядке этажей
+        with ProcessPoolExecutor(max_workers=min(jobs, len(floors))) as pool:
+            futures = {
+                floor: pool.submit(process_floor_job, floor_subtree(root, floor), floor, threshold, VERBOSE)
+                for floor in floors
+            }
+            for floor in floors:
+                objects, ids, timings[floor] = futures[floor].result()
+                apply_ids(root, ids)
+                objects_all_floors.update(objects)
+
+    for floor, elapsed in timings.items():
+        print(f"Этаж '{floor}' обработан за {elapsed * 1000:.1f} мс.")
 
     # Удаление пространств имен после обработки всех этажей
     remove_namespaces(tree)
@@ -281,7 +414,7 @@ def remove_data_name_attribute(root):
     for elem in root.iter():
         if 'data-name' in elem.attrib:
             del elem.attrib['data-name']
-            print(f"Удалён атрибут 'data-name' из элемента <{elem.tag}>")
+            log_detail(f"Удалён атрибут 'data-name' из элемента <{elem.tag}>")
 
 
 def save_svg(tree, svg_output_file):
@@ -333,8 +466,26 @@ def main():
         help="Пороговое значение для определения пересечения в пикселях. По умолчанию 10.",
     )
 
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        help="Число процессов для обработки этажей. По умолчанию 1 (без пула).",
+    )
+
+    parser.add_argument(
+        '-q',
+        '--quiet',
+        action='store_true',
+        help="Не выводить строку на каждую дверь и элемент, только предупреждения и итоги.",
+    )
+
     args = parser.parse_args()
 
+    global VERBOSE
+    VERBOSE = not args.quiet
+
     svg_input_file = args.input
     floors = args.floors
     threshold = args.threshold
@@ -353,7 +504,7 @@ def main():
     print(f"Пороговое значение: {threshold}")
     print(f"Файл вывода: {svg_output_file}")
 
-    updated_tree, objects_all_floors = parse_svg(svg_input_file, floors, threshold)
+    updated_tree, objects_all_floors = parse_svg(svg_input_file, floors, threshold, args.jobs)
     save_svg(updated_tree, svg_output_file)
 
     # Дополнительно: Вывод информации о всех обработанных этажах
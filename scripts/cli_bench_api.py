@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Нагрузка бенчмарка не должна попадать в лог запросов
+os.environ.setdefault("QUERY_LOG_ENABLED", "false")
+
+from app.core.config import settings  # noqa: E402
+from app.utils.query_log import read_query_log  # noqa: E402
+
+SCENARIOS = ["search", "search_batch", "floor_plan", "floor_plan_route", "objects", "autocomplete"]
+# Метрики, по которым сравнивается базовая линия: имя -> True, если больше значит лучше
+COMPARED_METRICS = {"throughput_rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False}
+USER_CONTEXT = {"time": "2025-03-03T12:00:00", "location": {"x": 0, "y": 0}}
+BATCH_SIZE = 10
+
+
+def load_workload(plan_file, query_log_file, seed):
+    """
+    Собирает запросы и пары кабинетов: из лога запросов, если он есть, иначе из плана здания.
+    """
+    queries, pairs = [], []
+    if query_log_file and os.path.exists(query_log_file):
+        for record in read_query_log(query_log_file):
+            if record.get("kind") in ("search", "search_batch") and record.get("query"):
+                queries.append(record["query"])
+            elif record.get("kind") == "route":
+                pairs.append((record["office_a_id"], record["office_b_id"]))
+        print(f"Из лога '{query_log_file}': {len(queries)} запросов, {len(pairs)} маршрутов")
+
+    rng = random.Random(seed)
+    with open(plan_file, 'r', encoding='utf-8') as f:
+        objects = json.load(f)['objects']
+    if not queries:
+        for obj in objects:
+            detail = obj['parsed_id']['detail']
+            queries.append(obj['parsed_id']['type'])
+            queries.append(detail.split('-')[0])
+            # Запрос с опечаткой: пропущенная буква
+            if len(detail) > 4:
+                position = rng.randrange(len(detail))
+                queries.append(detail[:position] + detail[position + 1 :])
+    if not pairs:
+        offices = [obj['id'] for obj in objects if obj['doors']]
+        pairs = [tuple(rng.sample(offices, 2)) for _ in range(200)]
+    return queries, pairs
+
+
+def build_requests(scenario, queries, pairs, count, rng):
+    """Возвращает список (метод, путь, params, json) для сценария."""
+    floors = settings.floors
+    requests = []
+    for _ in range(count):
+        if scenario == "search":
+            requests.append(
+                ("POST", "/search", {"query": rng.choice(queries), "user_floor": rng.choice(floors)}, USER_CONTEXT)
+            )
+        elif scenario == "search_batch":
+            body = {"queries": rng.sample(queries, min(BATCH_SIZE, len(queries))), "user_context": USER_CONTEXT}
+            requests.append(("POST", "/search/batch", {"user_floor": rng.choice(floors)}, body))
+        elif scenario == "floor_plan":
+            requests.append(("GET", "/floor-plan", {"floor": rng.choice(floors)}, None))
+        elif scenario == "floor_plan_route":
+            office_a_id, office_b_id = rng.choice(pairs)
+            floor = '_'.join(office_a_id.split('_')[:2])
+            params = {"floor": floor, "office_a_id": office_a_id, "office_b_id": office_b_id}
+            requests.append(("GET", "/floor-plan", params, None))
+        elif scenario == "objects":
+            requests.append(("GET", "/objects", {}, None))
+        elif scenario == "autocomplete":
+            query = rng.choice(queries)
+            requests.append(("GET", "/autocomplete", {"prefix": query[: rng.randint(1, max(1, len(query)))]}, None))
+    return requests
+
+
+async def run_scenario(client, requests, concurrency):
+    """Выполняет запросы с заданной параллельностью, возвращает задержки, число ошибок и общее время."""
+    latencies = []
+    errors = 0
+    queue = iter(requests)
+
+    async def worker():
+        nonlocal errors
+        for method, path, params, body in queue:
+            started = time.perf_counter()
+            response = await client.request(method, path, params=params, json=body)
+            latencies.append(time.perf_counter() - started)
+            # 404 для пары без маршрута — ожидаемый ответ, а не сбой
+            if response.status_code >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(latencies, errors, elapsed):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Сравнивает с базовой линией и возвращает список регрессий больше порога."""
+    regressions = []
+    for scenario, metrics in results.items():
+        base = baseline.get(scenario)
+        if not base:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), metrics[metric]
+            if not old:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > threshold:
+                regressions.append(f"{scenario}.{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+async def run(args):
+    from app.main import app
+
+    queries, pairs = load_workload(args.plan, args.query_log, args.seed)
+    rng = random.Random(args.seed)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for scenario in args.scenarios:
+            await run_scenario(client, build_requests(scenario, queries, pairs, args.warmup, rng), 1)
+            requests = build_requests(scenario, queries, pairs, args.requests, rng)
+            results[scenario] = summarize(*await run_scenario(client, requests, args.concurrency))
+            m = results[scenario]
+            print(
+                f"{scenario:<18} {m['throughput_rps']:>9.1f} rps  p50 {m['p50_ms']:>8.2f} мс  "
+                f"p95 {m['p95_ms']:>8.2f} мс  p99 {m['p99_ms']:>8.2f} мс  ошибок {m['errors']}"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк HTTP API через httpx.ASGITransport.")
+    parser.add_argument('-p', '--plan', type=str, default='data/plan_combined.json', help="Путь к JSON плана.")
+    parser.add_argument('-q', '--query-log', type=str, default=None, help="Лог запросов (JSONL) для воспроизведения.")
+    parser.add_argument(
+        '-s', '--scenarios', type=str, nargs='+', default=SCENARIOS, choices=SCENARIOS, help="Сценарии нагрузки."
+    )
+    parser.add_argument('-n', '--requests', type=int, default=200, help="Запросов на сценарий (по умолчанию: 200)")
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help="Параллельных клиентов (по умолчанию: 8)")
+    parser.add_argument('--warmup', type=int, default=20, help="Прогревочных запросов на сценарий (по умолчанию: 20)")
+    parser.add_argument('--seed', type=int, default=0, help="Зерно генератора нагрузки.")
+    parser.add_argument('-o', '--output', type=str, default=None, help="Сохранить результаты как базовую линию (JSON).")
+    parser.add_argument('-b', '--baseline', type=str, default=None, help="Базовая линия для сравнения (JSON).")
+    parser.add_argument(
+        '-t', '--threshold', type=float, default=0.2, help="Допустимое ухудшение метрики (по умолчанию: 0.2 = 20%%)"
+    )
+
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Базовая линия сохранена в '{args.output}'")
+
+    if any(m["errors"] for m in results.values()):
+        print("Есть ответы с ошибкой сервера.")
+        sys.exit(1)
+
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"Базовая линия '{args.baseline}' не найдена, сравнение пропущено.")
+            return
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Регрессии производительности:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"Регрессий больше {args.threshold:.0%} нет.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.object_processor import get_objects_map  # noqa: E402
+from app.utils.query_log import read_query_log  # noqa: E402
+from app.utils.text_processing import (  # noqa: E402
+    advanced_normalize_text_with_stemming,
+    handle_translit,
+)
+
+# Частота, которую получает каждый термин словаря здания без учёта логов
+BASE_COUNT = 1
+# Во сколько раз одно появление термина в логе запросов весомее базовой частоты
+QUERY_LOG_WEIGHT = 10
+# Более короткие термины не попадают в словарь: любое слово в пределах двух правок от них
+MIN_TERM_LENGTH = 3
+
+
+def normalize_terms(text):
+    """
+    Приводит текст к виду, в котором запрос попадает в handle_typos: транслит, очистка и стемминг.
+    Термины с цифрами и короче MIN_TERM_LENGTH отбрасываются: handle_typos их не исправляет, а как
+    кандидаты исправления они превращают незнакомые слова в номера и обрывки идентификаторов.
+    """
+    terms = advanced_normalize_text_with_stemming(handle_translit(text)).split()
+    return [term for term in terms if len(term) >= MIN_TERM_LENGTH and not any(char.isdigit() for char in term)]
+
+
+def split_detail(detail):
+    """
+    Разбивает detail объекта ('Toilet-Shkn-W', 'Kitchen-1') на отдельные слова.
+    """
+    return ' '.join(re.split(r'[-_\s]+', detail))
+
+
+def collect_vocabulary(plan_file, svg_file, synonyms_file, floors):
+    """
+    Собирает словарь здания: типы и detail объектов, человекочитаемые названия и синонимы.
+    """
+    vocabulary = Counter()
+
+    with open(plan_file, 'r', encoding='utf-8') as f:
+        objects = json.load(f)['objects']
+    for obj in objects:
+        vocabulary.update(normalize_terms(obj['parsed_id']['type']))
+        vocabulary.update(normalize_terms(split_detail(obj['parsed_id']['detail'])))
+
+    objects_map = get_objects_map(ET.parse(svg_file), floors)
+    for readable_name in objects_map.values():
+        vocabulary.update(normalize_terms(readable_name))
+
+    with open(synonyms_file, 'r', encoding='utf-8') as f:
+        synonyms = json.load(f)
+    for key, values in synonyms.items():
+        vocabulary.update(normalize_terms(key))
+        for value in values:
+            vocabulary.update(normalize_terms(value))
+
+    return vocabulary
+
+
+def count_query_terms(query_log_file, vocabulary):
+    """
+    Считает, как часто термины словаря встречаются в логе запросов (JSONL с полем 'query'),
+    включая ротированные файлы лога. Слова вне словаря не учитываются, чтобы не закреплять опечатки.
+    """
+    counts = Counter()
+    if not query_log_file:
+        return counts
+    if not os.path.exists(query_log_file):
+        print(f"Лог запросов '{query_log_file}' не найден, частоты берутся только из словаря здания.")
+        return counts
+
+    for record in read_query_log(query_log_file):
+        query = record.get('query')
+        if not query:
+            continue
+        counts.update(term for term in normalize_terms(query) if term in vocabulary)
+    return counts
+
+
+def save_dictionary(vocabulary, query_counts, output_file):
+    try:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            for term in sorted(vocabulary):
+                count = vocabulary[term] * BASE_COUNT + query_counts[term] * QUERY_LOG_WEIGHT
+                f.write(f"{term} {count}\n")
+        print(f"Доменный словарь ({len(vocabulary)} терминов) сохранён в '{output_file}'")
+    except IOError as e:
+        print(f"Ошибка при сохранении словаря: {e}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка компактного словаря SymSpell из словаря здания.")
+    parser.add_argument('-p', '--plan', type=str, default='data/plan_combined.json', help="Путь к JSON плана.")
+    parser.add_argument('-s', '--svg', type=str, default='media/улк-5.svg', help="Путь к SVG плана.")
+    parser.add_argument('--synonyms', type=str, default='data/synonyms.json', help="Путь к словарю синонимов.")
+    parser.add_argument(
+        '-q', '--query-log', type=str, default=None, help="Лог запросов (JSONL) для частот терминов."
+    )
+    parser.add_argument(
+        '-o', '--output', type=str, default='data/domain_dictionary.txt', help="Путь к выходному словарю."
+    )
+    parser.add_argument(
+        '-f',
+        '--floors',
+        type=str,
+        nargs='+',
+        default=['Floor_First', 'Floor_Second', 'Floor_Third', 'Floor_Fourth'],
+        help="Имена этажей, используемые в ID групп SVG.",
+    )
+
+    args = parser.parse_args()
+
+    vocabulary = collect_vocabulary(args.plan, args.svg, args.synonyms, args.floors)
+    query_counts = count_query_terms(args.query_log, vocabulary)
+    save_dictionary(vocabulary, query_counts, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+
+from symspellpy import SymSpell
+
+
+def build_index(dictionary_file, max_edit_distance=2):
+    """
+    Загружает текстовый словарь частот и строит по нему индекс SymSpell.
+    """
+    if not os.path.exists(dictionary_file):
+        print(f"Файл словаря '{dictionary_file}' не найден.")
+        sys.exit(1)
+
+    sym_spell = SymSpell(max_dictionary_edit_distance=max_edit_distance)
+    sym_spell.load_dictionary(dictionary_file, term_index=0, count_index=1)
+    return sym_spell
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Предкомпиляция словаря SymSpell в pickle для быстрой загрузки без сети."
+    )
+    parser.add_argument(
+        '-i', '--input', type=str, default='frequency_dictionary_ru.txt', help="Путь к текстовому словарю частот."
+    )
+    parser.add_argument(
+        '-o', '--output', type=str, default='data/symspell_ru.pickle', help="Путь к выходному pickle-файлу."
+    )
+    parser.add_argument(
+        '-d', '--max-edit-distance', type=int, default=2, help="Максимальное расстояние редактирования."
+    )
+
+    args = parser.parse_args()
+
+    sym_spell = build_index(args.input, args.max_edit_distance)
+    sym_spell.save_pickle(args.output)
+    print(f"Индекс SymSpell ({len(sym_spell.words)} слов) сохранён в '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,113 +1,195 @@
 import argparse
-import json
+import random
 import sys
-from heapq import nsmallest
-from typing import Any, Dict, List
+import time
+import tracemalloc
+from itertools import combinations
+from pathlib import Path
 
 import networkx as nx
-from pydantic import BaseModel, ValidationError
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-class ParsedID(BaseModel):
-    floor: str
-    type: str
-    detail: str
+from app.repositories.graph_repository import GraphRepository  # noqa: E402
+from app.services.route_service import RouteService  # noqa: E402
 
+# Допустимое расхождение длин маршрутов между движками (суммы весов с плавающей точкой)
+WEIGHT_TOLERANCE = 1e-6
+# Бюджет памяти кэша деревьев путей для движка tree
+TREE_CACHE_BYTES = 32 * 2**20
 
-class Position(BaseModel):
-    x: float
-    y: float
-    width: float
-    height: float
 
+class NetworkXEngine:
+    """Маршрутизация приложения: топ-K путей через RouteService (алгоритм Йена в networkx)."""
 
-class Door(BaseModel):
-    id: str
-    position: Position
-    parsed_id: ParsedID
+    name = "networkx"
 
+    def __init__(self, service: RouteService, top_k: int):
+        self.service = service
+        self.top_k = top_k
 
-class Object(BaseModel):
-    id: str
-    parsed_id: ParsedID
-    position: Position
-    doors: List[Door]
+    def route(self, office_a_id, office_b_id):
+        try:
+            return self.service.find_top_k_paths(office_a_id, office_b_id, self.top_k)[0]["total_weight"]
+        except ValueError:
+            return float('inf')
 
 
-class GraphData(BaseModel):
-    nodes: List[str]
-    edges: List[Dict[str, Any]]
+class TreeEngine:
+    """Кэш деревьев кратчайших путей к кабинету B (RouteService.find_shortest_path), как в /floor-plan."""
 
+    name = "tree"
 
-class DataModel(BaseModel):
-    objects: List[Object]
-    graph: GraphData
+    def __init__(self, service: RouteService):
+        self.service = service
+        self.hits = 0
 
+    def route(self, office_a_id, office_b_id):
+        try:
+            routes, cache_hit = self.service.find_shortest_path(office_a_id, office_b_id)
+        except ValueError:
+            return float('inf')
+        self.hits += cache_hit
+        return routes[0]["total_weight"]
 
-def load_data(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        # Валидация данных через Pydantic
-        validated_data = DataModel(**data)
-        return validated_data
-    except FileNotFoundError:
-        print(f"Файл '{file_path}' не найден.")
-        sys.exit(1)
-    except json.JSONDecodeError:
-        print(f"Ошибка при разборе JSON файла '{file_path}'.")
-        sys.exit(1)
-    except ValidationError as e:
-        print(f"Ошибка в структуре данных JSON:\n{e}")
-        sys.exit(1)
 
+class CSREngine:
+    """Дейкстра scipy по CSR-матрице смежности, один проход от всех дверей кабинета A."""
+
+    name = "csr"
+
+    def __init__(self, service: RouteService, doors):
+        nodes = list(service.G.nodes)
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.graph = nx.to_scipy_sparse_array(service.G, nodelist=nodes, weight='weight', format='csr')
+        self.doors = {
+            office_id: [self.index[door] for door in office_doors] for office_id, office_doors in doors.items()
+        }
 
-def get_office_doors(objects: List[Object], office_id: str) -> List[str]:
-    for office in objects:
-        if office.id == office_id:
-            return [door.id for door in office.doors]
-    return []
+    def route(self, office_a_id, office_b_id):
+        distances = dijkstra(self.graph, directed=False, indices=self.doors[office_a_id], min_only=True)
+        return float(distances[self.doors[office_b_id]].min())
 
 
-def build_graph(graph_data: GraphData):
-    G = nx.Graph()
+class MatrixEngine:
+    """Заранее посчитанная матрица расстояний между всеми дверями, запрос — выборка минимума."""
 
-    # Добавляем узлы
-    nodes = graph_data.nodes
-    G.add_nodes_from(nodes)
+    name = "matrix"
 
-    # Добавляем ребра с атрибутами
-    for edge in graph_data.edges:
-        from_node = edge['from']
-        to_node = edge['to']
-        line_id = edge.get('line_id')
-        weight = edge.get('weight', 1)
-        G.add_edge(from_node, to_node, line_id=line_id, weight=weight)
+    def __init__(self, csr_engine: CSREngine, doors):
+        door_nodes = sorted({door for office_doors in doors.values() for door in office_doors})
+        columns = [csr_engine.index[door] for door in door_nodes]
+        self.matrix = dijkstra(csr_engine.graph, directed=False, indices=columns)[:, columns]
+        row = {door: i for i, door in enumerate(door_nodes)}
+        self.doors = {office_id: [row[door] for door in office_doors] for office_id, office_doors in doors.items()}
 
-    return G
+    def route(self, office_a_id, office_b_id):
+        return float(self.matrix[np.ix_(self.doors[office_a_id], self.doors[office_b_id])].min())
 
 
-def extract_line_ids(G, path):
-    line_ids = []
-    for i in range(len(path) - 1):
-        edge_data = G.get_edge_data(path[i], path[i + 1])
-        if edge_data:
-            line_id = edge_data.get('line_id')
-            if isinstance(line_id, list):
-                line_id = line_id[0]
-            line_ids.append(line_id)
-    return line_ids
+ENGINES = ["networkx", "tree", "csr", "matrix"]
 
 
-def compute_path_weight(G, path):
-    total_weight = 0
-    for i in range(len(path) - 1):
-        edge_data = G.get_edge_data(path[i], path[i + 1])
-        if edge_data and 'weight' in edge_data:
-            total_weight += edge_data['weight']
-        else:
-            total_weight += 1
-    return total_weight
+def print_routes(service: RouteService, office_a_id, office_b_id, top_k):
+    try:
+        routes = service.find_top_k_paths(office_a_id, office_b_id, top_k)
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
+
+    print(f"\nТоп-{len(routes)} самых кратчайших маршрутов от '{office_a_id}' до '{office_b_id}':")
+    for idx, route in enumerate(routes, 1):
+        print(f"\nМаршрут {idx}:")
+        print(f"Путь: {' -> '.join(route['path'])}")
+        print(f"Линии: {route['line_ids']}")
+        print(f"Общая длина: {route['total_weight']}")
+
+
+def build_engine(name, service, doors, top_k, engines):
+    """Строит движок и возвращает его вместе с пиковым объёмом памяти на построение (байты)."""
+    tracemalloc.start()
+    if name == "networkx":
+        engine = NetworkXEngine(service, top_k)
+    elif name == "tree":
+        engine = TreeEngine(service)
+    elif name == "csr":
+        engine = CSREngine(service, doors)
+    else:
+        engine = MatrixEngine(engines.get("csr") or CSREngine(service, doors), doors)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return engine, peak
+
+
+def bench(input_file, engine_names, top_k, sample, seed, contract):
+    tracemalloc.start()
+    repository = GraphRepository(data_file_path=input_file)
+    service = RouteService(repository, contract=contract, tree_cache_bytes=TREE_CACHE_BYTES)
+    _, graph_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"Граф: {service.G.number_of_nodes()} узлов, {service.G.number_of_edges()} рёбер, "
+        f"{graph_peak / 2**20:.1f} МБ"
+    )
+    if contract:
+        full = repository.graph
+        print(f"Без стягивания цепочек: {full.number_of_nodes()} узлов, {full.number_of_edges()} рёбер")
+
+    doors = {obj.id: [door.id for door in obj.doors if door.id in service.G] for obj in repository.data.objects}
+    doors = {office_id: office_doors for office_id, office_doors in doors.items() if office_doors}
+    pairs = list(combinations(sorted(doors), 2))
+    if sample and sample < len(pairs):
+        pairs = random.Random(seed).sample(pairs, sample)
+    print(f"Пар кабинетов: {len(pairs)}, top_k={top_k}\n")
+
+    engines = {}
+    weights = {}
+    for name in engine_names:
+        started = time.perf_counter()
+        engine, memory = build_engine(name, service, doors, top_k, engines)
+        build_time = time.perf_counter() - started
+        engines[name] = engine
+
+        latencies = np.empty(len(pairs))
+        results = np.empty(len(pairs))
+        for i, (office_a_id, office_b_id) in enumerate(pairs):
+            started = time.perf_counter()
+            results[i] = engine.route(office_a_id, office_b_id)
+            latencies[i] = time.perf_counter() - started
+        weights[name] = results
+
+        latencies_ms = latencies * 1000
+        p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+        print(
+            f"{name:<9} построение {build_time * 1000:>8.1f} мс, {memory / 2**20:>6.2f} МБ | "
+            f"p50 {p50:.3f} мс  p95 {p95:.3f} мс  p99 {p99:.3f} мс  max {latencies_ms.max():.3f} мс  "
+            f"всего {latencies.sum():.2f} с"
+        )
+        if name == "tree":
+            cache = service.tree_cache
+            print(
+                f"{'':<9} попаданий в кэш {engine.hits}/{len(pairs)}, "
+                f"деревьев {len(cache)}, {cache.nbytes / 2**10:.1f} КБ"
+            )
+
+    reference = engine_names[0]
+    mismatches = 0
+    for name in engine_names[1:]:
+        expected, actual = weights[reference], weights[name]
+        # isclose считает две бесконечности (недостижимую пару) совпадающими
+        differ = ~np.isclose(expected, actual, rtol=0, atol=WEIGHT_TOLERANCE)
+        for i in np.flatnonzero(differ)[:10]:
+            print(f"Расхождение {reference}/{name} для {pairs[i]}: {expected[i]} != {actual[i]}")
+        mismatches += int(differ.sum())
+
+    unreachable = int(np.isinf(weights[reference]).sum())
+    print(f"\nНедостижимых пар: {unreachable}")
+    if mismatches:
+        print(f"Движки расходятся в длине оптимального маршрута: {mismatches} пар.")
+        sys.exit(1)
+    print("Все движки согласны в длине оптимального маршрута.")
 
 
 def main():
@@ -116,73 +198,31 @@ def main():
     parser.add_argument('-a', '--office_a_id', type=str, help="ID кабинета A")
     parser.add_argument('-b', '--office_b_id', type=str, help="ID кабинета B")
     parser.add_argument('-k', '--top_k', type=int, default=3, help="Количество топ маршрутов (по умолчанию: 3)")
+    parser.add_argument('--bench', action='store_true', help="Замерить движки маршрутизации на всех парах кабинетов")
+    parser.add_argument(
+        '-e', '--engines', type=str, nargs='+', default=ENGINES, choices=ENGINES, help="Движки для --bench"
+    )
+    parser.add_argument('-n', '--sample', type=int, default=None, help="Случайная выборка пар для --bench")
+    parser.add_argument('--seed', type=int, default=0, help="Зерно выборки пар")
+    parser.add_argument(
+        '--no-contraction', action='store_true', help="Искать по исходному графу, без стягивания цепочек пересечений"
+    )
 
     args = parser.parse_args()
 
+    if args.bench:
+        if not args.input:
+            parser.print_help()
+            sys.exit(1)
+        bench(args.input, args.engines, args.top_k, args.sample, args.seed, not args.no_contraction)
+        return
+
     if not args.input or not args.office_a_id or not args.office_b_id:
         parser.print_help()
         sys.exit(1)
 
-    file_path = args.input
-    office_a_id = args.office_a_id
-    office_b_id = args.office_b_id
-    top_k = args.top_k
-
-    # Загрузка данных
-    data = load_data(file_path)
-
-    # Получение дверей для кабинетов A и B
-    doors_a = get_office_doors(data.objects, office_a_id)
-    doors_b = get_office_doors(data.objects, office_b_id)
-
-    if not doors_a:
-        print(f"Кабинет A с ID '{office_a_id}' не найден или у него нет дверей.")
-        sys.exit(1)
-    if not doors_b:
-        print(f"Кабинет B с ID '{office_b_id}' не найден или у него нет дверей.")
-        sys.exit(1)
-
-    # Построение графа
-    G = build_graph(data.graph)
-
-    all_top_paths = []
-
-    for door_a in doors_a:
-        for door_b in doors_b:
-            if door_a == door_b:
-                continue
-            try:
-                paths_generator = nx.shortest_simple_paths(G, source=door_a, target=door_b, weight='weight')
-                for _ in range(top_k):
-                    path = next(paths_generator)
-                    total_weight = compute_path_weight(G, path)
-                    all_top_paths.append((path, total_weight))
-            except (nx.NetworkXNoPath, StopIteration):
-                continue
-
-    if not all_top_paths:
-        print("Маршруты от кабинета A до кабинета B не найдены.")
-        sys.exit(1)
-
-    global_top_paths = nsmallest(top_k, all_top_paths, key=lambda x: x[1])
-
-    unique_top_paths = []
-    seen_paths = set()
-    for path, weight in global_top_paths:
-        path_tuple = tuple(path)
-        if path_tuple not in seen_paths:
-            seen_paths.add(path_tuple)
-            unique_top_paths.append((path, weight))
-        if len(unique_top_paths) == top_k:
-            break
-
-    print(f"\nТоп-{len(unique_top_paths)} самых кратчайших маршрутов от '{office_a_id}' до '{office_b_id}':")
-    for idx, (path, weight) in enumerate(unique_top_paths, 1):
-        line_ids = extract_line_ids(G, path)
-        print(f"\nМаршрут {idx}:")
-        print(f"Путь: {' -> '.join(path)}")
-        print(f"Линии: {line_ids}")
-        print(f"Общая длина: {weight}")
+    service = RouteService(GraphRepository(data_file_path=args.input), contract=not args.no_contraction)
+    print_routes(service, args.office_a_id, args.office_b_id, args.top_k)
 
 
 if __name__ == "__main__":
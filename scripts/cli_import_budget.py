@@ -0,0 +1,55 @@
+import argparse
+import subprocess
+import sys
+import time
+
+# Запрещаем сетевые соединения до импорта приложения: импорт должен работать офлайн
+OFFLINE_IMPORT = """
+import socket
+
+def _blocked(*args, **kwargs):
+    raise RuntimeError("Сетевое соединение во время импорта запрещено")
+
+socket.socket.connect = _blocked
+socket.create_connection = _blocked
+
+import {module}
+"""
+
+
+def measure_import(module):
+    """
+    Импортирует модуль в чистом интерпретаторе без доступа к сети и возвращает время импорта в секундах.
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', OFFLINE_IMPORT.format(module=module)],
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка, что импорт приложения быстрый и не требует сети.")
+    parser.add_argument('-m', '--module', type=str, default='app.main', help="Импортируемый модуль.")
+    parser.add_argument(
+        '-b', '--budget', type=float, default=3.0, help="Допустимое время импорта в секундах. По умолчанию 3.0."
+    )
+
+    args = parser.parse_args()
+
+    result, elapsed = measure_import(args.module)
+    if result.returncode != 0:
+        print(f"Импорт '{args.module}' завершился с ошибкой:\n{result.stderr}")
+        sys.exit(1)
+
+    print(f"Импорт '{args.module}': {elapsed:.3f} с (бюджет {args.budget:.3f} с)")
+    if elapsed > args.budget:
+        print("Бюджет времени импорта превышен.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,83 @@
 import argparse
+import hashlib
 import json
 import math
+import os
 import sys
+import time
 import xml.etree.ElementTree as ET
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 import matplotlib.patches as patches
 import matplotlib.pyplot as plt
 
 
-def find_matching_point(x, y, doors, intersections, threshold=10.0):
-    closest_point = None
-    closest_distance = threshold
+class PointGrid:
+    """
+    Равномерная сетка точек с ячейкой размером с порог сопоставления.
+    Точка ближе порога всегда лежит в той же или соседней ячейке, поэтому запрос смотрит 3×3 ячейки.
+    """
+
+    def __init__(self, points, cell_size):
+        # points: [(id, x, y)] в исходном порядке, он нужен для прежнего разрешения равных расстояний
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        if cell_size <= 0:
+            return
+        for order, (point_id, px, py) in enumerate(points):
+            self.cells[self.cell_of(px, py)].append((order, point_id, px, py))
+
+    def cell_of(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def nearest(self, x, y, threshold):
+        """Ближайшая точка строго ближе threshold; при равных расстояниях — первая в исходном порядке."""
+        if self.cell_size <= 0:
+            return None
+        cx, cy = self.cell_of(x, y)
+        candidates = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                candidates.extend(self.cells.get((cx + dx, cy + dy), ()))
+        candidates.sort()
+
+        closest_point = None
+        closest_distance = threshold
+        for _, point_id, px, py in candidates:
+            distance = math.hypot(px - x, py - y)
+            if distance < closest_distance:
+                closest_point = point_id
+                closest_distance = distance
+        return closest_point
+
+
+def build_point_grids(doors, intersections, threshold):
+    """Сетки пересечений и центров дверей этажа для find_matching_point."""
+    intersection_points = [
+        (point_id, point_info['position']['x'], point_info['position']['y'])
+        for point_id, point_info in intersections.items()
+    ]
+    # Для дверей сопоставляется центр прямоугольника
+    door_points = [
+        (
+            point_id,
+            point_info['position']['x'] + point_info['position']['width'] / 2,
+            point_info['position']['y'] + point_info['position']['height'] / 2,
+        )
+        for point_id, point_info in doors.items()
+    ]
+    return PointGrid(door_points, threshold), PointGrid(intersection_points, threshold)
 
-    # Сначала проверяем пересечения (приоритет)
-    for point_id, point_info in intersections.items():
-        px = point_info['position']['x']
-        py = point_info['position']['y']
-        distance = math.hypot(px - x, py - y)
 
-        if distance < closest_distance:
-            closest_point = point_id
-            closest_distance = distance
+def find_matching_point(x, y, door_grid, intersection_grid, threshold=10.0):
+    # Сначала проверяем пересечения (приоритет)
+    closest_point = intersection_grid.nearest(x, y, threshold)
 
     # Проверяем двери, если пересечение не найдено
     if closest_point is None:
-        for point_id, point_info in doors.items():
-            # Рассчитываем центр двери
-            px = point_info['position']['x'] + point_info['position']['width'] / 2
-            py = point_info['position']['y'] + point_info['position']['height'] / 2
-            distance = math.hypot(px - x, py - y)
-
-            if distance < closest_distance:
-                closest_point = point_id
-                closest_distance = distance
+        closest_point = door_grid.nearest(x, y, threshold)
 
     return closest_point
 
@@ -50,108 +95,171 @@ def parse_id(item_id):
     return parsed
 
 
-def parse_svg(svg_file, floor, threshold):
-    # Парсинг SVG
+# Пространство имён SVG
+SVG_NS = '{http://www.w3.org/2000/svg}'
+# Группы этажа, которые читает конвертер: '<этаж>_Stairs', '<этаж>_Offices' и т.д.
+FLOOR_GROUPS = ['Stairs', 'Offices', 'Doors', 'Intersections', 'AllowedLines']
+# Размер порции файла при потоковом разборе
+STREAM_CHUNK_SIZE = 2**20
+# Версия формата плана этажа в кэше: увеличить при изменении логики parse_floor
+CACHE_VERSION = 1
+
+
+def load_svg(svg_file):
+    try:
+        return ET.parse(svg_file).getroot()
+    except ET.ParseError as e:
+        print(f"Ошибка при парсинге SVG-файла: {e}")
+        sys.exit(1)
+    except FileNotFoundError:
+        print(f"SVG-файл '{svg_file}' не найден.")
+        sys.exit(1)
+
+
+def find_floor_groups(root, floors):
+    """
+    Находит группы всех этажей за один обход дерева: {этаж: {'Stairs': <g>, 'Offices': <g>, ...}}.
+    Как и поиск './/svg:g[@id=...]', берётся первая группа с нужным id.
+    """
+    wanted = {f"{floor}_{kind}": (floor, kind) for floor in floors for kind in FLOOR_GROUPS}
+    groups = {floor: {} for floor in floors}
+    for elem in root.iter(f'{SVG_NS}g'):
+        target = wanted.get(elem.get('id'))
+        if target is not None and elem is not root:
+            floor, kind = target
+            groups[floor].setdefault(kind, elem)
+    return groups
+
+
+def iter_svg_events(svg_file):
+    """
+    События start/end разбора SVG порциями по STREAM_CHUNK_SIZE.
+    В отличие от ET.iterparse (порции по 16 КБ), длинные атрибуты вроде встроенных картинок
+    не разбираются заново на каждой порции.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    with open(svg_file, 'rb') as f:
+        for chunk in iter(partial(f.read, STREAM_CHUNK_SIZE), b''):
+            parser.feed(chunk)
+            yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+def stream_floor_groups(svg_file, floors):
+    """
+    То же, что find_floor_groups, но без построения всего дерева (потоковый разбор).
+
+    Сохраняются только нужные группы этажей, остальные элементы очищаются сразу после разбора,
+    поэтому пиковая память определяется размером групп, а не всего файла (например, встроенных картинок).
+    """
+    wanted = {f"{floor}_{kind}": (floor, kind) for floor in floors for kind in FLOOR_GROUPS}
+    groups = {floor: {} for floor in floors}
+    # Для каждого открытого элемента: сохраняется ли он как группа этажа
+    captured_stack = []
+    capturing = 0
     try:
-        tree = ET.parse(svg_file)
-        root = tree.getroot()
+        for event, elem in iter_svg_events(svg_file):
+            if event == 'start':
+                target = wanted.get(elem.get('id')) if elem.tag == f'{SVG_NS}g' and captured_stack else None
+                captured = target is not None and target[1] not in groups[target[0]]
+                if captured:
+                    groups[target[0]][target[1]] = elem
+                    capturing += 1
+                captured_stack.append(captured)
+            else:
+                if captured_stack.pop():
+                    capturing -= 1
+                elif not capturing:
+                    elem.clear()
     except ET.ParseError as e:
         print(f"Ошибка при парсинге SVG-файла: {e}")
         sys.exit(1)
     except FileNotFoundError:
         print(f"SVG-файл '{svg_file}' не найден.")
         sys.exit(1)
+    return groups
+
 
-    # Пространство имён SVG
-    namespaces = {'svg': 'http://www.w3.org/2000/svg'}
+def read_rect(elem):
+    return {
+        'x': float(elem.get('x', '0')),
+        'y': float(elem.get('y', '0')),
+        'width': float(elem.get('width', '0')),
+        'height': float(elem.get('height', '0')),
+    }
 
+
+def parse_floor(floor, groups, threshold):
+    """
+    Собирает план одного этажа из уже найденных групп SVG.
+    """
     # Словари для хранения информации
     objects = {f"{floor}_Stairs": [], f"{floor}_Offices": []}
     doors_dict = {}  # Словарь дверей для графа
     intersections = {}  # Пересечения
+    # Объекты по id для привязки дверей; при повторе id дверь получает первый объект
+    stairs_by_id = {}
+    offices_by_id = {}
 
     # Извлечение информации о лестницах
-    stairs_group = root.find(f'.//svg:g[@id="{floor}_Stairs"]', namespaces)
+    stairs_group = groups.get('Stairs')
     if stairs_group is not None:
-        for stair in stairs_group.findall('svg:g', namespaces):
+        for stair in stairs_group.findall(f'{SVG_NS}g'):
             stair_id = stair.get('id')
             if stair_id:
                 parsed_id = parse_id(stair_id)
-                objects[f"{floor}_Stairs"].append(
-                    {'id': stair_id, 'parsed_id': parsed_id, 'doors': []}  # Инициализация списка дверей
-                )
+                stair_info = {'id': stair_id, 'parsed_id': parsed_id, 'doors': []}  # Инициализация списка дверей
+                objects[f"{floor}_Stairs"].append(stair_info)
+                stairs_by_id.setdefault(stair_id, stair_info)
     else:
         print(f"Группа '{floor}_Stairs' не найдена в SVG.")
 
     # Извлечение информации об офисах
-    offices_group = root.find(f'.//svg:g[@id="{floor}_Offices"]', namespaces)
+    offices_group = groups.get('Offices')
     if offices_group is not None:
-        for office in offices_group.findall('svg:rect', namespaces):
+        for office in offices_group.findall(f'{SVG_NS}rect'):
             office_id = office.get('id')
             if office_id:
                 parsed_id = parse_id(office_id)
-                x = float(office.get('x', '0'))
-                y = float(office.get('y', '0'))
-                width = float(office.get('width', '0'))
-                height = float(office.get('height', '0'))
-                objects[f"{floor}_Offices"].append(
-                    {
-                        'id': office_id,
-                        'parsed_id': parsed_id,
-                        'position': {'x': x, 'y': y, 'width': width, 'height': height},
-                        'doors': [],  # Инициализация списка дверей
-                    }
-                )
+                office_info = {
+                    'id': office_id,
+                    'parsed_id': parsed_id,
+                    'position': read_rect(office),
+                    'doors': [],  # Инициализация списка дверей
+                }
+                objects[f"{floor}_Offices"].append(office_info)
+                offices_by_id.setdefault(office_id, office_info)
     else:
         print(f"Группа '{floor}_Offices' не найдена в SVG.")
 
     # Извлечение информации о дверях и их ассоциация с объектами
-    doors_group = root.find(f'.//svg:g[@id="{floor}_Doors"]', namespaces)
+    doors_group = groups.get('Doors')
     if doors_group is not None:
-        for door in doors_group.findall('svg:rect', namespaces):
+        for door in doors_group.findall(f'{SVG_NS}rect'):
             door_id = door.get('id')
             if door_id:
                 parsed_id = parse_id(door_id)
-                x = float(door.get('x', '0'))
-                y = float(door.get('y', '0'))
-                width = float(door.get('width', '0'))
-                height = float(door.get('height', '0'))
 
                 # Определение объекта, к которому принадлежит дверь
                 object_detail = parsed_id.get('detail', '')
                 if object_detail.startswith('Office'):
-                    object_id = f"{floor}_Office_{object_detail.split('_')[1]}"
-                    # Поиск соответствующего офиса
-                    for office in objects[f"{floor}_Offices"]:
-                        if office['id'] == object_id:
-                            door_info = {
-                                'id': door_id,
-                                'position': {'x': x, 'y': y, 'width': width, 'height': height},
-                                'parsed_id': parsed_id,
-                            }
-                            office['doors'].append(door_info)
-                            doors_dict[door_id] = door_info  # Добавление в словарь дверей для графа
-                            break
+                    owner = offices_by_id.get(f"{floor}_Office_{object_detail.split('_')[1]}")
                 elif object_detail.startswith('Stairs'):
-                    object_id = f"{floor}_Stairs_{object_detail.split('_')[1]}"
-                    # Поиск соответствующей лестницы
-                    for stair in objects[f"{floor}_Stairs"]:
-                        if stair['id'] == object_id:
-                            door_info = {
-                                'id': door_id,
-                                'position': {'x': x, 'y': y, 'width': width, 'height': height},
-                                'parsed_id': parsed_id,
-                            }
-                            stair['doors'].append(door_info)
-                            doors_dict[door_id] = door_info  # Добавление в словарь дверей для графа
-                            break
+                    owner = stairs_by_id.get(f"{floor}_Stairs_{object_detail.split('_')[1]}")
                 else:
                     print(f"WARN: Дверь '{door_id}' не соответствует известным объектам. Объект: '{object_detail}'")
+                    continue
+
+                if owner is not None:
+                    door_info = {'id': door_id, 'position': read_rect(door), 'parsed_id': parsed_id}
+                    owner['doors'].append(door_info)
+                    doors_dict[door_id] = door_info  # Добавление в словарь дверей для графа
     else:
         print(f"Группа '{floor}_Doors' не найдена в SVG.")
 
     # Извлечение информации о пересечениях
-    intersections_group = root.find(f'.//svg:g[@id="{floor}_Intersections"]', namespaces)
+    intersections_group = groups.get('Intersections')
     if intersections_group is not None:
         for elem in intersections_group:
             elem_id = elem.get('id')
@@ -165,22 +273,15 @@ def parse_svg(svg_file, floor, threshold):
                         'parsed_id': parsed_id,
                     }
                 elif elem.tag.endswith('rect'):
-                    x = float(elem.get('x', '0'))
-                    y = float(elem.get('y', '0'))
-                    width = float(elem.get('width', '0'))
-                    height = float(elem.get('height', '0'))
-                    intersections[elem_id] = {
-                        'position': {'x': x, 'y': y, 'width': width, 'height': height},
-                        'parsed_id': parsed_id,
-                    }
+                    intersections[elem_id] = {'position': read_rect(elem), 'parsed_id': parsed_id}
     else:
         print(f"Группа '{floor}_Intersections' не найдена в SVG.")
 
     # Извлечение информации о разрешённых линиях перемещения
-    allowed_lines_group = root.find(f'.//svg:g[@id="{floor}_AllowedLines"]', namespaces)
+    allowed_lines_group = groups.get('AllowedLines')
     allowed_lines = []
     if allowed_lines_group is not None:
-        for line in allowed_lines_group.findall('svg:line', namespaces):
+        for line in allowed_lines_group.findall(f'{SVG_NS}line'):
             line_id = line.get('id')
             x1 = float(line.get('x1', '0'))
             y1 = float(line.get('y1', '0'))
@@ -204,6 +305,7 @@ def parse_svg(svg_file, floor, threshold):
 
     # Извлечение соединений из разрешённых линий
     graph_edges = []
+    door_grid, intersection_grid = build_point_grids(doors_dict, intersections, threshold)
 
     for line in allowed_lines:
         line_id = line['id']
@@ -212,8 +314,8 @@ def parse_svg(svg_file, floor, threshold):
         x2 = line['x2']
         y2 = line['y2']
 
-        point1_id = find_matching_point(x1, y1, doors_dict, intersections, threshold)
-        point2_id = find_matching_point(x2, y2, doors_dict, intersections, threshold)
+        point1_id = find_matching_point(x1, y1, door_grid, intersection_grid, threshold)
+        point2_id = find_matching_point(x2, y2, door_grid, intersection_grid, threshold)
 
         if point1_id and point2_id:
             graph_edges.append(
@@ -236,6 +338,89 @@ def parse_svg(svg_file, floor, threshold):
     return floor_plan
 
 
+def timed_parse_floor(floor, groups, threshold):
+    """parse_floor с замером времени; выполняется в процессе пула при --jobs."""
+    started = time.perf_counter()
+    floor_plan = parse_floor(floor, groups, threshold)
+    return floor_plan, time.perf_counter() - started
+
+
+def parse_floors(floor_groups, floors, threshold, jobs):
+    """
+    Разбирает этажи независимо друг от друга: по одному или в пуле процессов.
+    Возвращает {этаж: (план, время)} в порядке floors, независимо от порядка завершения.
+    """
+    if jobs <= 1 or len(floors) <= 1:
+        return {floor: timed_parse_floor(floor, floor_groups[floor], threshold) for floor in floors}
+    with ProcessPoolExecutor(max_workers=min(jobs, len(floors))) as pool:
+        futures = {floor: pool.submit(timed_parse_floor, floor, floor_groups[floor], threshold) for floor in floors}
+        return {floor: futures[floor].result() for floor in floors}
+
+
+def parse_svg(svg_file, floor, threshold):
+    """План одного этажа. Для нескольких этажей SVG разбирается один раз в main."""
+    return parse_floor(floor, find_floor_groups(load_svg(svg_file), [floor])[floor], threshold)
+
+
+def floor_hash(groups, threshold):
+    """Хэш содержимого групп этажа и параметров разбора: по нему план этажа берётся из кэша."""
+    digest = hashlib.sha256(f"{CACHE_VERSION}:{threshold}".encode('utf-8'))
+    for kind in FLOOR_GROUPS:
+        group = groups.get(kind)
+        digest.update(kind.encode('utf-8'))
+        digest.update(ET.tostring(group, encoding='utf-8') if group is not None else b'-')
+    return digest.hexdigest()
+
+
+def load_cached_floor(cache_dir, floor, content_hash):
+    try:
+        with open(os.path.join(cache_dir, f"{floor}.json"), 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return cached['plan'] if cached.get('hash') == content_hash else None
+
+
+def save_cached_floor(cache_dir, floor, content_hash, floor_plan):
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, f"{floor}.json"), 'w', encoding='utf-8') as f:
+        json.dump({'hash': content_hash, 'plan': floor_plan}, f, ensure_ascii=False)
+
+
+def write_manifest(manifest_file, output_file, floor_hashes):
+    """
+    Сохраняет хэши этажей и список этажей, изменившихся с прошлой генерации.
+    Сервер по манифесту перестраивает индексы только этих этажей.
+    """
+    previous = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            previous = json.load(f).get('floors', {})
+    changed = [floor for floor, content_hash in floor_hashes.items() if previous.get(floor) != content_hash]
+    changed += [floor for floor in previous if floor not in floor_hashes]
+
+    manifest = {'plan': output_file, 'floors': floor_hashes, 'changed': changed}
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+    print(f"Манифест изменений сохранён в '{manifest_file}'. Изменённые этажи: {', '.join(changed) or 'нет'}")
+
+
+def attach_working_hours(objects, working_hours_file):
+    """
+    Добавляет объектам часы работы из JSON-файла вида {"<id объекта>": {"open": "08:00", "close": "17:00"}}.
+    """
+    try:
+        with open(working_hours_file, 'r', encoding='utf-8') as f:
+            working_hours = json.load(f)
+    except FileNotFoundError:
+        print(f"Файл часов работы '{working_hours_file}' не найден.")
+        sys.exit(1)
+
+    for obj in objects:
+        if obj['id'] in working_hours:
+            obj['working_hours'] = working_hours[obj['id']]
+
+
 def save_json(data, output_file):
     try:
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -416,6 +601,36 @@ def main():
         default=10.0,
         help="Пороговое значение для сопоставления точек. По умолчанию 10.0.",
     )
+    parser.add_argument(
+        '--working-hours',
+        type=str,
+        default=None,
+        help="JSON-файл с часами работы объектов (например, data/working_hours.json).",
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        help="Число процессов для разбора этажей. По умолчанию 1 (без пула).",
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help="Потоковый разбор для больших SVG: в памяти держатся только группы этажей.",
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default=None,
+        help="Каталог кэша планов этажей: неизменившиеся этажи не разбираются заново.",
+    )
+    parser.add_argument(
+        '--manifest',
+        type=str,
+        default=None,
+        help="JSON-файл манифеста с хэшами этажей и списком изменённых этажей.",
+    )
     parser.add_argument(
         '--visualize',
         action='store_true',
@@ -439,7 +654,8 @@ def main():
     print(f"Файл вывода: {output_file}")
 
     all_floor_plans = []
-    combined_graph_nodes = set()
+    # Узлы в порядке этажей и документа, чтобы одинаковый SVG давал одинаковый JSON
+    combined_graph_nodes = {}
     combined_graph_edges = []
     stairs_connections = {  # Словарь для лестниц и связанных с ними дверей
         "First": [],
@@ -450,10 +666,36 @@ def main():
         "Sixth": [],
     }
 
+    # Лестница каждой двери лестницы, чтобы подписывать рёбра между этажами без повторного поиска
+    stair_by_door = {}
+
+    # SVG разбирается один раз, группы всех этажей находятся за один обход
+    if args.stream:
+        floor_groups = stream_floor_groups(svg_file, floors)
+    else:
+        floor_groups = find_floor_groups(load_svg(svg_file), floors)
+
+    floor_hashes = {}
+    cached_plans = {}
+    for floor in floors:
+        content_hash = floor_hashes[floor] = floor_hash(floor_groups[floor], threshold)
+        floor_plan = load_cached_floor(args.cache_dir, floor, content_hash) if args.cache_dir else None
+        if floor_plan is not None:
+            print(f"Этаж '{floor}' не изменился, план взят из кэша.")
+            cached_plans[floor] = floor_plan
+
+    # Этажи разбираются независимо (в том числе в пуле процессов), в родителе остаётся только связь лестниц
+    changed_floors = [floor for floor in floors if floor not in cached_plans]
+    parsed_plans = parse_floors(floor_groups, changed_floors, threshold, args.jobs)
+    for floor, (floor_plan, elapsed) in parsed_plans.items():
+        print(f"Этаж '{floor}' разобран за {elapsed * 1000:.1f} мс.")
+        if args.cache_dir:
+            save_cached_floor(args.cache_dir, floor, floor_hashes[floor], floor_plan)
+
     # хранение всех office
     all_objects_list = []
     for floor in floors:
-        floor_plan = parse_svg(svg_file, floor, threshold)
+        floor_plan = cached_plans[floor] if floor in cached_plans else parsed_plans[floor][0]
         all_floor_plans.append(floor_plan)
 
         offices = floor_plan['objects'].get(f"{floor}_Offices", [])
@@ -461,13 +703,15 @@ def main():
 
         # Узлы и рёбра для текущего этажа
         graph = floor_plan['graph']
-        combined_graph_nodes.update(graph['nodes'])
+        combined_graph_nodes.update(dict.fromkeys(graph['nodes']))
         combined_graph_edges.extend(graph['edges'])
 
         # Сбор дверей, связанных с лестницами
         for stair in floor_plan['objects'].get(f"{floor}_Stairs", []):
             parsed_id = stair.get('parsed_id', {})
             stair_name = parsed_id.get('detail')
+            for door in stair['doors']:
+                stair_by_door.setdefault(door['id'], stair['id'])
             if not stair_name:
                 continue
             if stair_name in stairs_connections:
@@ -480,15 +724,11 @@ def main():
     for stair_name, doors_by_stair in stairs_connections.items():
         for i in range(len(doors_by_stair) - 1):
             for j in range(i + 1, len(doors_by_stair)):
-                floor1, door1 = doors_by_stair[i]
-                floor2, door2 = doors_by_stair[j]
+                _, door1 = doors_by_stair[i]
+                _, door2 = doors_by_stair[j]
 
-                # Найти ID лестницы на этаже floor1, связанной с door1
-                stair_id = None
-                for stair in all_floor_plans[floors.index(floor1)]['objects'].get(f"{floor1}_Stairs", []):
-                    if any(d['id'] == door1 for d in stair['doors']):
-                        stair_id = stair['id']
-                        break
+                # ID лестницы, связанной с door1
+                stair_id = stair_by_door.get(door1)
 
                 combined_graph_edges.append(
                     {
@@ -499,6 +739,9 @@ def main():
                     }
                 )
 
+    if args.working_hours:
+        attach_working_hours(all_objects_list, args.working_hours)
+
     # Сохранение всех этажей в одном JSON
     combined_plan = {
         "objects": all_objects_list,
@@ -511,6 +754,9 @@ def main():
 
     save_json(combined_plan, output_file)
 
+    if args.manifest:
+        write_manifest(args.manifest, output_file, floor_hashes)
+
     # Визуализация, если флаг установлен
     if args.visualize:
         visualize_threshold(all_floor_plans, threshold)